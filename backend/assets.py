@@ -0,0 +1,135 @@
+"""Per-asset view of maintenance records.
+
+Each equipment record is one maintenance event; the physical asset is
+identified by its serie. The assets collection holds one document per serie
+with the asset's latest state, derived from its events. Events are read in
+(serie, fecha, created_at) order through an index, so an asset is rebuilt
+from its own events only and a full migration streams the collection once.
+"""
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, DeleteOne, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+MAINTENANCE_TYPES = ("preventivo", "correctivo", "limpieza")
+
+# Newest event first within each asset
+ASSET_EVENT_SORT = [("serie", ASCENDING), ("fecha", DESCENDING), ("created_at", DESCENDING)]
+
+ASSET_EVENT_FIELDS = (
+    "id", "serie", "area", "equipment_type", "nombre_pc", "marca", "modelo", "fecha",
+    "tipo_mantenimiento", "estado_equipo", "tecnico_responsable"
+)
+
+# Fields copied from the newest event onto the asset
+ASSET_STATE_FIELDS = ("area", "equipment_type", "nombre_pc", "marca", "modelo", "estado_equipo")
+
+EVENT_INDEXES = [
+    IndexModel(ASSET_EVENT_SORT, name="serie_fecha_created_at"),
+]
+
+ASSET_INDEXES = [
+    IndexModel([("serie", ASCENDING)], name="serie_unique", unique=True),
+    IndexModel([("equipment_type", ASCENDING), ("last_maintenance_at", DESCENDING)], name="type_last_maintenance_at"),
+    IndexModel([("synced_at", ASCENDING)], name="synced_at"),
+]
+
+def build_asset(serie: str, events: List[dict], synced_at: datetime) -> dict:
+    latest = events[0]
+    last_by_type = {maintenance_type: None for maintenance_type in MAINTENANCE_TYPES}
+    for event in events:
+        maintenance_type = event.get("tipo_mantenimiento")
+        if last_by_type.get(maintenance_type) is None:
+            last_by_type[maintenance_type] = event["fecha"]
+    return {
+        "serie": serie,
+        **{field: latest.get(field) for field in ASSET_STATE_FIELDS},
+        "last_maintenance": {
+            "id": latest["id"],
+            "fecha": latest["fecha"],
+            "tipo_mantenimiento": latest.get("tipo_mantenimiento"),
+            "tecnico_responsable": latest.get("tecnico_responsable"),
+        },
+        "last_maintenance_at": latest["fecha"],
+        "first_maintenance_at": events[-1]["fecha"],
+        "last_by_type": last_by_type,
+        "maintenance_count": len(events),
+        "synced_at": synced_at,
+        # next_due is left in place until the scheduler recomputes it
+        "schedule_pending": True,
+    }
+
+async def group_events(cursor) -> AsyncIterator[Tuple[str, List[dict]]]:
+    # The cursor is sorted by serie, so each asset's events arrive together
+    serie, events = None, []
+    async for event in cursor:
+        if events and event["serie"] != serie:
+            yield serie, events
+            events = []
+        serie = event["serie"]
+        events.append(event)
+    if events:
+        yield serie, events
+
+def event_cursor(database, query: dict, batch_size: int):
+    projection = {"_id": 0, **{field: 1 for field in ASSET_EVENT_FIELDS}}
+    return database.equipment.find(query, projection).sort(ASSET_EVENT_SORT).batch_size(batch_size)
+
+async def refresh_assets(database, series: Iterable[str], batch_size: int = 500) -> List[dict]:
+    # Rebuilds the given assets from their events; assets left without
+    # events are removed. Returns the assets as written.
+    series = sorted({serie for serie in series if serie})
+    refreshed = []
+    for start in range(0, len(series), batch_size):
+        chunk = series[start:start + batch_size]
+        synced_at = datetime.utcnow()
+        operations = []
+        remaining = set(chunk)
+        async for serie, events in group_events(event_cursor(database, {"serie": {"$in": chunk}}, batch_size)):
+            asset = build_asset(serie, events, synced_at)
+            operations.append(UpdateOne({"serie": serie}, {"$set": asset}, upsert=True))
+            refreshed.append(asset)
+            remaining.discard(serie)
+        operations.extend(DeleteOne({"serie": serie}) for serie in remaining)
+        if operations:
+            await database.assets.bulk_write(operations, ordered=False)
+    return refreshed
+
+def synced_before(started_at: datetime) -> dict:
+    return {"$or": [{"synced_at": {"$lt": started_at}}, {"synced_at": {"$exists": False}}]}
+
+async def write_migrated(database, operations: List[UpdateOne]):
+    try:
+        await database.assets.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # The upsert of an asset refreshed during the migration collides with
+        # the asset itself, which is already newer than what was read
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+            raise
+
+async def migrate_assets(database, batch_size: int = 500) -> int:
+    # Streams every event once and upserts assets in batches; assets not
+    # touched by this run no longer have events and are dropped at the end.
+    # Assets that refresh_assets rebuilt after the run started are left as
+    # they are: the events read here may predate the write behind it.
+    started_at = datetime.utcnow()
+    operations = []
+    migrated = 0
+    async for serie, events in group_events(event_cursor(database, {}, batch_size)):
+        operations.append(UpdateOne(
+            {"serie": serie, **synced_before(started_at)},
+            {"$set": build_asset(serie, events, datetime.utcnow())},
+            upsert=True
+        ))
+        if len(operations) >= batch_size:
+            await write_migrated(database, operations)
+            migrated += len(operations)
+            operations = []
+    if operations:
+        await write_migrated(database, operations)
+        migrated += len(operations)
+    await database.assets.delete_many({"synced_at": {"$lt": started_at}})
+    return migrated
@@ -0,0 +1,130 @@
+"""Append-only audit log of equipment and user changes.
+
+Each entry records who changed which entity and the field-level diff
+(field, old, new). Entries are only ever inserted: AuditWriter buffers them
+and inserts them in batches off the request path, retrying failed batches.
+Entry ids are unique, so a retried batch cannot insert an entry twice. The
+TTL index on "at" bounds the collection to the retention period.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Bookkeeping fields: the entry's actor and time already cover them
+AUDIT_IGNORED_FIELDS = ("_id", "updated_at", "updated_by", "serie_lower", "nombre_pc_lower")
+# Changes recorded without their values
+AUDIT_REDACTED_FIELDS = ("password",)
+
+# Newest first; every history index ends with it
+AUDIT_SORT = [("at", DESCENDING), ("id", DESCENDING)]
+
+def audit_indexes(retention_days: int) -> List[IndexModel]:
+    indexes = [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("entity", ASCENDING), ("entity_id", ASCENDING)] + AUDIT_SORT, name="entity_at_id"),
+        IndexModel([("actor", ASCENDING)] + AUDIT_SORT, name="actor_at_id"),
+        IndexModel(AUDIT_SORT, name="at_id"),
+    ]
+    if retention_days > 0:
+        # TTL indexes must be single-field
+        indexes.append(IndexModel([("at", ASCENDING)], name="at_ttl", expireAfterSeconds=retention_days * 86400))
+    return indexes
+
+def field_diff(before: Optional[dict], after: Optional[dict]) -> List[dict]:
+    before, after = before or {}, after or {}
+    changes = []
+    for field in sorted(set(before) | set(after)):
+        if field in AUDIT_IGNORED_FIELDS or before.get(field) == after.get(field):
+            continue
+        if field in AUDIT_REDACTED_FIELDS:
+            changes.append({"field": field, "old": None, "new": None})
+        else:
+            changes.append({"field": field, "old": before.get(field), "new": after.get(field)})
+    return changes
+
+def audit_entry(entity: str, entity_id: str, action: str, actor: str, changes: List[dict],
+                at: Optional[datetime] = None) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "entity": entity,
+        "entity_id": entity_id,
+        "action": action,
+        "actor": actor,
+        "at": at or datetime.utcnow(),
+        "changes": changes,
+    }
+
+def equipment_audit_entries(actor: str, saved: Iterable[dict], previous: Iterable[dict],
+                            deleted: Iterable[str]) -> List[dict]:
+    # Saved records with a previous version were updated, the rest created
+    previous_by_id = {equipment["id"]: equipment for equipment in previous if equipment}
+    at = datetime.utcnow()
+    entries = []
+    for equipment in saved:
+        before = previous_by_id.get(equipment["id"])
+        changes = field_diff(before, equipment)
+        if changes:
+            entries.append(audit_entry("equipment", equipment["id"], "update" if before else "create", actor, changes, at))
+    for equipment_id in deleted:
+        entries.append(audit_entry("equipment", equipment_id, "delete", actor, field_diff(previous_by_id.get(equipment_id), None), at))
+    return entries
+
+class AuditWriter:
+    def __init__(self, collection, batch_size: int = 500, flush_seconds: float = 1.0, max_pending: int = 50000):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.pending: List[dict] = []
+        self.written = 0
+        self.failures = 0
+        self.wakeup = asyncio.Event()
+        self.lock = asyncio.Lock()
+
+    async def record(self, entries: List[dict]):
+        if not entries:
+            return
+        self.pending.extend(entries)
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+        # Backpressure: a writer that cannot keep up slows requests down
+        # instead of growing without bound
+        if len(self.pending) >= self.max_pending:
+            await self.flush()
+
+    async def flush(self):
+        async with self.lock:
+            while self.pending:
+                batch = self.pending[:self.batch_size]
+                try:
+                    await self.collection.insert_many(batch, ordered=False)
+                except BulkWriteError as e:
+                    # Entries from an earlier, partly applied attempt are already stored
+                    if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+                        raise
+                del self.pending[:len(batch)]
+                self.written += len(batch)
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Entries stay pending and the next pass retries them
+                self.failures += 1
+                logging.exception("Audit log flush failed")
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self.pending), "written": self.written, "failures": self.failures}
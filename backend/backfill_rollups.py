@@ -0,0 +1,18 @@
+"""Rebuild the daily rollups from the equipment maintenance records.
+
+Run from the backend directory: python backfill_rollups.py [batch size]
+"""
+import asyncio
+import sys
+
+from rollups import rebuild_rollups
+from server import client, db
+
+async def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    buckets = await rebuild_rollups(db, batch_size)
+    print(f"Daily rollups rebuilt: {buckets} buckets")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""Micro-benchmark for equipment list serialization.
+
+Compares the per-row cost of the model path (build Equipment models, let
+FastAPI validate them against the response model and encode with the
+stdlib) with the direct path used by the list endpoints.
+
+Run from the backend directory: python bench_serialization.py
+"""
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+from server import EQUIPMENT_DEFAULTS, Equipment
+from serialization import dumps
+
+ROUNDS = 20
+
+def sample_rows(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "area": f"Área {i % 12}",
+            "equipment_type": ("cpu", "monitor", "impresora")[i % 3],
+            "nombre_pc": f"PC-{i:05d}",
+            "marca": "Dell",
+            "modelo": f"OptiPlex {3000 + i % 90}",
+            "serie": f"SN{i:08d}",
+            "fecha": now - timedelta(days=i % 365),
+            "tipo_mantenimiento": ("preventivo", "correctivo", "limpieza")[i % 3],
+            "observaciones": "Limpieza interna, cambio de pasta térmica y revisión de ventiladores. " * 3,
+            "tecnico_responsable": f"Técnico {i % 7}",
+            "estado_equipo": "operativo",
+            "created_by": "admin",
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": None,
+            "updated_by": None,
+        }
+        for i in range(count)
+    ]
+
+response_adapter = TypeAdapter(List[Equipment])
+
+def model_path(rows: list) -> bytes:
+    models = [Equipment(**row) for row in rows]
+    content = response_adapter.dump_python(response_adapter.validate_python(models), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def direct_path(rows: list) -> bytes:
+    return dumps([{**EQUIPMENT_DEFAULTS, **row} for row in rows])
+
+def per_row_microseconds(encode, rows: list) -> float:
+    encode(rows)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        encode(rows)
+    return (time.perf_counter() - start) / ROUNDS / len(rows) * 1e6
+
+def main():
+    for count in (100, 1000):
+        rows = sample_rows(count)
+        assert json.loads(model_path(rows)) == json.loads(direct_path(rows))
+        before = per_row_microseconds(model_path, rows)
+        after = per_row_microseconds(direct_path, rows)
+        print(f"{count:>5} rows: model path {before:6.2f} us/row, direct path {after:6.2f} us/row ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""In-process response cache with TTL/LRU eviction and request coalescing.
+
+Storage sits behind CacheBackend so entries can later live outside the
+process (for example shared between uvicorn workers) without touching the
+handlers that use ResponseCache.
+"""
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def clear(self):
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return False, None
+        self.entries.move_to_end(key)
+        return True, value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self.entries.pop(key, None)
+
+    async def clear(self):
+        self.entries.clear()
+
+    def size(self) -> int:
+        return len(self.entries)
+
+def make_cache_key(namespace: str, **params) -> str:
+    return f"{namespace}:{json.dumps(params, sort_keys=True, default=str)}"
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        # Bumped on invalidation so results computed before it are not stored
+        self.generation = 0
+        self.inflight: Dict[str, asyncio.Task] = {}
+        # In-flight computations of single invalidated keys, not stored either
+        self.stale: Set[asyncio.Task] = set()
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        found, value = await self.backend.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The generation is read now: the task may first run after an invalidation
+            task = asyncio.ensure_future(self._compute(key, compute, self.generation))
+            self.inflight[key] = task
+        # Shielded so one caller disconnecting does not cancel the shared query
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Any]], generation: int) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await compute()
+            if generation == self.generation and task not in self.stale:
+                await self.backend.set(key, value, self.ttl)
+            return value
+        finally:
+            self.stale.discard(task)
+            # An invalidation may already have replaced this task for the key
+            if self.inflight.get(key) is task:
+                del self.inflight[key]
+
+    async def invalidate(self):
+        self.generation += 1
+        self.inflight.clear()
+        await self.backend.clear()
+
+    async def invalidate_key(self, key: str):
+        # Only this key's in-flight computation is discarded; other keys keep theirs
+        task = self.inflight.pop(key, None)
+        if task is not None:
+            self.stale.add(task)
+        await self.backend.delete(key)
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": self.backend.size(),
+            "evictions": getattr(self.backend, "evictions", None),
+        }
@@ -0,0 +1,136 @@
+"""In-process pub/sub bus behind the server-sent events endpoint.
+
+Published events get an id made of a per-process epoch and a sequence
+number and are kept in a bounded history, so a client reconnecting with its
+last event id is replayed what it missed. When that is no longer possible
+(the id is from another process or has left the history) the client gets a
+"reset" event and reloads instead. Each subscriber has a bounded queue; a
+subscriber that falls behind is dropped with a "reset" rather than holding
+events in memory for it.
+
+Events are published by the API process that made the write. With several
+processes against a replica set, watch_changes feeds the bus from MongoDB
+change streams instead, so every process sees every write.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Set
+
+from serialization import dumps
+
+RESET_EVENT = "reset"
+
+class Subscriber:
+    def __init__(self, max_queued: int):
+        self.queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue(maxsize=max_queued)
+        self.overflowed = False
+
+class EventBus:
+    def __init__(self, history_size: int = 1000, max_queued: int = 1000):
+        self.epoch = format(int(time.time() * 1000), "x")
+        self.sequence = 0
+        self.history: Deque[dict] = deque(maxlen=history_size)
+        self.max_queued = max_queued
+        self.subscribers: Set[Subscriber] = set()
+
+    def publish(self, event_type: str, data: dict) -> dict:
+        self.sequence += 1
+        event = {"id": f"{self.epoch}-{self.sequence}", "type": event_type, "data": data}
+        self.history.append(event)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+                self.subscribers.discard(subscriber)
+        return event
+
+    def missed_since(self, last_event_id: str) -> Optional[List[dict]]:
+        # Events after last_event_id, or None when they cannot all be replayed
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        oldest = self.sequence - len(self.history) + 1
+        if sequence < oldest - 1 or sequence > self.sequence:
+            return None
+        return list(self.history)[sequence - oldest + 1:]
+
+    def subscribe(self, last_event_id: Optional[str] = None):
+        # Returns the subscriber and the events to send first
+        subscriber = Subscriber(self.max_queued)
+        self.subscribers.add(subscriber)
+        if not last_event_id:
+            return subscriber, []
+        missed = self.missed_since(last_event_id)
+        if missed is None:
+            return subscriber, [self.reset_event()]
+        return subscriber, missed
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def reset_event(self) -> dict:
+        # Carries the current id so the client resumes from here after reloading
+        return {"id": f"{self.epoch}-{self.sequence}", "type": RESET_EVENT, "data": {}}
+
+    def close(self):
+        # Ends every open stream, e.g. on shutdown
+        for subscriber in list(self.subscribers):
+            subscriber.overflowed = True
+            try:
+                subscriber.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+        self.subscribers.clear()
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self.subscribers), "last_event_id": f"{self.epoch}-{self.sequence}", "history": len(self.history)}
+
+def format_event(event: dict) -> bytes:
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (event["id"].encode(), event["type"].encode(), dumps(event["data"]))
+
+async def stream_events(bus: EventBus, subscriber: Subscriber, initial: List[dict], heartbeat_seconds: float,
+                        authorize: Optional[Callable[[], Awaitable[bool]]] = None):
+    # authorize, when given, is awaited about once per heartbeat_seconds and
+    # ends the stream when it returns False
+    try:
+        for event in initial:
+            yield format_event(event)
+        authorized_at = time.monotonic()
+        while True:
+            if authorize and time.monotonic() - authorized_at >= heartbeat_seconds:
+                if not await authorize():
+                    return
+                authorized_at = time.monotonic()
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat_seconds)
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing an idle stream
+                yield b": ping\n\n"
+                continue
+            if event is None:
+                return
+            yield format_event(event)
+            if subscriber.overflowed and subscriber.queue.empty():
+                yield format_event(bus.reset_event())
+                return
+    finally:
+        bus.unsubscribe(subscriber)
+
+async def watch_changes(collection, publish_change, retry_seconds: float = 5, **options):
+    # Follows a change stream, resuming after errors from the last token seen
+    resume_token = None
+    while True:
+        try:
+            async with collection.watch(resume_after=resume_token, **options) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    await publish_change(change)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception(f"Change stream on {collection.name} failed")
+            await asyncio.sleep(retry_seconds)
@@ -0,0 +1,160 @@
+"""Report writers for maintenance records.
+
+Writers receive documents in batches and keep memory bounded by the batch
+size. They are synchronous so callers can run them off the event loop.
+"""
+import csv
+import io
+from datetime import datetime
+
+from openpyxl import Workbook
+from pymongo import MongoClient
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_SHEET_NAME = "Mantenimiento Equipos"
+
+# Report columns as (header, value extractor) pairs
+EXPORT_COLUMNS = [
+    ("ID", lambda e: e["id"]),
+    ("Área", lambda e: e["area"]),
+    ("Tipo de Equipo", lambda e: e["equipment_type"]),
+    ("Nombre PC", lambda e: e.get("nombre_pc", "")),
+    ("Marca", lambda e: e["marca"]),
+    ("Modelo", lambda e: e["modelo"]),
+    ("Serie", lambda e: e["serie"]),
+    ("Fecha Mantenimiento", lambda e: e["fecha"].strftime("%Y-%m-%d")),
+    ("Tipo Mantenimiento", lambda e: e["tipo_mantenimiento"]),
+    ("Estado Equipo", lambda e: e["estado_equipo"]),
+    ("Observaciones", lambda e: e["observaciones"]),
+    ("Técnico Responsable", lambda e: e["tecnico_responsable"]),
+    ("Creado por", lambda e: e["created_by"]),
+    ("Fecha Creación", lambda e: e["created_at"].strftime("%Y-%m-%d %H:%M:%S")),
+]
+
+EXPORT_HEADERS = [header for header, _ in EXPORT_COLUMNS]
+
+# Date columns that typed formats store as timestamps instead of text,
+# mapped to the record field they come from
+TIMESTAMP_COLUMNS = {
+    "Fecha Mantenimiento": "fecha",
+    "Fecha Creación": "created_at",
+}
+
+def export_row(equipment: dict) -> list:
+    return [value(equipment) for _, value in EXPORT_COLUMNS]
+
+def csv_chunk(documents: list, include_header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if include_header:
+        writer.writerow(EXPORT_HEADERS)
+    writer.writerows(export_row(equipment) for equipment in documents)
+    return buffer.getvalue()
+
+class XlsxExportWriter:
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    extension = "xlsx"
+    available = True
+
+    def __init__(self, path: str):
+        self.path = path
+        # Write-only workbooks flush rows to disk instead of keeping cells in memory
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(EXPORT_SHEET_NAME)
+        self.sheet.append(EXPORT_HEADERS)
+
+    def write_rows(self, documents: list):
+        for equipment in documents:
+            self.sheet.append(export_row(equipment))
+
+    def close(self):
+        self.workbook.save(self.path)
+
+class CsvExportWriter:
+    media_type = "text/csv; charset=utf-8"
+    extension = "csv"
+    available = True
+
+    def __init__(self, path: str):
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.file.write(csv_chunk([], include_header=True))
+
+    def write_rows(self, documents: list):
+        self.file.write(csv_chunk(documents))
+
+    def close(self):
+        self.file.close()
+
+class ParquetExportWriter:
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+    # pyarrow is optional; the format is refused when it is not installed
+    available = pa is not None
+
+    def __init__(self, path: str):
+        # Mongo keeps dates as naive UTC with millisecond precision
+        self.schema = pa.schema([
+            (header, pa.timestamp("ms") if header in TIMESTAMP_COLUMNS else pa.string())
+            for header in EXPORT_HEADERS
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def column_values(self, header: str, value, documents: list) -> list:
+        if header in TIMESTAMP_COLUMNS:
+            return [equipment[TIMESTAMP_COLUMNS[header]] for equipment in documents]
+        return [value(equipment) for equipment in documents]
+
+    def write_rows(self, documents: list):
+        # Each batch becomes one row group, built column by column
+        columns = {header: self.column_values(header, value, documents) for header, value in EXPORT_COLUMNS}
+        self.writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+EXPORT_WRITERS = {
+    XlsxExportWriter.extension: XlsxExportWriter,
+    CsvExportWriter.extension: CsvExportWriter,
+    ParquetExportWriter.extension: ParquetExportWriter,
+}
+
+def run_export_job(mongo_url: str, db_name: str, job_id: str, query: dict, sort: list,
+                   export_format: str, path: str, batch_size: int):
+    # Runs in a worker process: opens its own connection and reports progress
+    # on the job document so any API process can serve status polls
+    client = MongoClient(mongo_url)
+    try:
+        database = client.get_database(db_name)
+        jobs = database.export_jobs
+        total = database.equipment.count_documents(query)
+        jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "running", "total": total, "started_at": datetime.utcnow()}}
+        )
+
+        writer = EXPORT_WRITERS[export_format](path)
+        processed = 0
+        batch = []
+        for equipment in database.equipment.find(query, {"_id": 0}).sort(sort).batch_size(batch_size):
+            batch.append(equipment)
+            if len(batch) >= batch_size:
+                writer.write_rows(batch)
+                processed += len(batch)
+                batch = []
+                jobs.update_one({"id": job_id}, {"$set": {"processed": processed}})
+        if batch:
+            writer.write_rows(batch)
+            processed += len(batch)
+        writer.close()
+
+        jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "completed", "processed": processed, "finished_at": datetime.utcnow()}}
+        )
+    finally:
+        client.close()
@@ -0,0 +1,76 @@
+"""Readers for bulk equipment imports.
+
+Readers yield (row number, row) pairs lazily so uploads are consumed in
+chunks. Columns may use the report headers or the model field names.
+"""
+import csv
+import io
+from datetime import datetime
+from itertools import islice
+
+from openpyxl import load_workbook
+
+# Report headers accepted on import, mapped to Equipment fields
+IMPORT_FIELDS = {
+    "Área": "area",
+    "Tipo de Equipo": "equipment_type",
+    "Nombre PC": "nombre_pc",
+    "Marca": "marca",
+    "Modelo": "modelo",
+    "Serie": "serie",
+    "Fecha Mantenimiento": "fecha",
+    "Tipo Mantenimiento": "tipo_mantenimiento",
+    "Estado Equipo": "estado_equipo",
+    "Observaciones": "observaciones",
+    "Técnico Responsable": "tecnico_responsable",
+}
+
+def normalize_header(header) -> str:
+    header = str(header or "").strip()
+    return IMPORT_FIELDS.get(header, header)
+
+def clean_row(headers: list, values) -> dict:
+    # Blank cells are dropped so model defaults apply; other values become text
+    row = {}
+    for header, value in zip(headers, values):
+        if value is None or header not in IMPORT_FIELDS.values():
+            continue
+        if not isinstance(value, datetime):
+            value = str(value).strip()
+            if not value:
+                continue
+        row[header] = value
+    return row
+
+def iter_csv_rows(file):
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    headers = [normalize_header(header) for header in next(reader, [])]
+    for row_number, values in enumerate(reader, start=2):
+        if any(values):
+            yield row_number, clean_row(headers, values)
+
+def iter_xlsx_rows(file):
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [normalize_header(header) for header in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            if any(value is not None for value in values):
+                yield row_number, clean_row(headers, values)
+    finally:
+        workbook.close()
+
+IMPORT_READERS = {
+    "csv": iter_csv_rows,
+    "xlsx": iter_xlsx_rows,
+}
+
+def read_chunk(rows, size: int) -> list:
+    return list(islice(rows, size))
@@ -0,0 +1,18 @@
+"""Rebuild the assets collection from the equipment maintenance records.
+
+Run from the backend directory: python migrate_assets.py [batch size]
+"""
+import asyncio
+import sys
+
+from assets import migrate_assets
+from server import client, db
+
+async def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    migrated = await migrate_assets(db, batch_size)
+    print(f"Assets migrated: {migrated} assets")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""Translation of equipment filters into Mongo queries.
+
+Filters are normalized first: unset and blank fields are dropped and values
+are canonicalized, so equivalent filters share one key. The query, sort and
+index hint built for a key are memoized; plans are shared between requests
+and must not be mutated by callers. The key is also what the response cache
+and the export jobs use to recognize a filter. Only indexes known to exist
+are hinted: a hint naming a missing index fails the query.
+"""
+import json
+import re
+from collections import OrderedDict
+from typing import Collection, Dict, NamedTuple, Optional
+
+from pymongo import DESCENDING
+
+# Keyset pagination order; every compound index below ends with it
+EQUIPMENT_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+SEARCH_MODES = ("contains", "text", "exact", "prefix")
+
+EQUALITY_FIELDS = ("equipment_type", "estado_equipo", "tipo_mantenimiento")
+
+# Equality filters that match a compound index exactly. Hinting it keeps the
+# planner from choosing the bare sort index and filtering the whole collection.
+EQUALITY_INDEXES = {
+    ("equipment_type",): "type_created_at_id",
+    ("estado_equipo",): "estado_created_at_id",
+    ("tipo_mantenimiento",): "mantenimiento_created_at_id",
+    ("equipment_type", "estado_equipo", "tipo_mantenimiento"): "type_estado_mantenimiento_created_at_id",
+}
+
+class InvalidFilter(ValueError):
+    pass
+
+class QueryPlan(NamedTuple):
+    key: str
+    query: dict
+    sort: list
+    hint: Optional[str]
+
+def normalize_filter(filters: dict) -> dict:
+    normalized = {}
+    for field, value in filters.items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value in (None, ""):
+            continue
+        normalized[field] = value
+    if "search" in normalized:
+        normalized["search_mode"] = normalized.get("search_mode") or "contains"
+        if normalized["search_mode"] not in SEARCH_MODES:
+            raise InvalidFilter(f"Unsupported search mode. Use one of: {', '.join(SEARCH_MODES)}")
+    else:
+        # A mode without a term does not filter anything
+        normalized.pop("search_mode", None)
+    return normalized
+
+def filter_key(normalized: dict) -> str:
+    return json.dumps(normalized, sort_keys=True, default=lambda value: value.isoformat())
+
+def build_search_query(search: str, search_mode: str) -> dict:
+    if search_mode == "text":
+        return {"$text": {"$search": search}}
+
+    normalized = search.lower()
+    if search_mode == "exact":
+        return {"$or": [{"serie_lower": normalized}, {"nombre_pc_lower": normalized}]}
+    if search_mode == "prefix":
+        # Anchored, case-sensitive regexes on the lowercased fields use their indexes
+        prefix = {"$regex": f"^{re.escape(normalized)}"}
+        return {"$or": [{"serie_lower": prefix}, {"nombre_pc_lower": prefix}]}
+
+    pattern = {"$regex": re.escape(search), "$options": "i"}
+    return {
+        "$or": [
+            {"marca": pattern},
+            {"modelo": pattern},
+            {"serie": pattern},
+            {"observaciones": pattern}
+        ]
+    }
+
+def build_equipment_query(normalized: dict) -> dict:
+    query = {field: normalized[field] for field in EQUALITY_FIELDS if field in normalized}
+    if "area" in normalized:
+        query["area"] = {"$regex": re.escape(normalized["area"]), "$options": "i"}
+
+    # Either end of the date range may be left open
+    fecha = {}
+    if "fecha_inicio" in normalized:
+        fecha["$gte"] = normalized["fecha_inicio"]
+    if "fecha_fin" in normalized:
+        fecha["$lte"] = normalized["fecha_fin"]
+    if fecha:
+        query["fecha"] = fecha
+
+    if "search" in normalized:
+        query.update(build_search_query(normalized["search"], normalized["search_mode"]))
+    return query
+
+def equipment_hint(normalized: dict, available_indexes: Optional[Collection[str]] = None) -> Optional[str]:
+    # Search terms have their own indexes ($text cannot be hinted at all);
+    # available_indexes None means every declared index exists
+    if "search" in normalized:
+        return None
+    hint = EQUALITY_INDEXES.get(tuple(field for field in EQUALITY_FIELDS if field in normalized))
+    if hint is not None and available_indexes is not None and hint not in available_indexes:
+        return None
+    return hint
+
+class QueryPlanner:
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.plans: "OrderedDict[str, QueryPlan]" = OrderedDict()
+        self.available_indexes: Optional[frozenset] = None
+        self.hits = 0
+        self.misses = 0
+
+    def use_indexes(self, index_names: Collection[str]):
+        # Index names present on the collection; plans built before may hint others
+        self.available_indexes = frozenset(index_names)
+        self.plans.clear()
+
+    def plan(self, filters: dict) -> QueryPlan:
+        normalized = normalize_filter(filters)
+        key = filter_key(normalized)
+        plan = self.plans.get(key)
+        if plan is not None:
+            self.hits += 1
+            self.plans.move_to_end(key)
+            return plan
+
+        self.misses += 1
+        plan = QueryPlan(key, build_equipment_query(normalized), EQUIPMENT_SORT, equipment_hint(normalized, self.available_indexes))
+        self.plans[key] = plan
+        while len(self.plans) > self.max_entries:
+            self.plans.popitem(last=False)
+        return plan
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.plans)}
@@ -0,0 +1,15 @@
+"""Rebuild the dashboard counters from the equipment collection.
+
+Run from the backend directory: python reconcile_counters.py
+"""
+import asyncio
+
+from server import client, rebuild_dashboard_counters
+
+async def main():
+    counters = await rebuild_dashboard_counters()
+    print(f"Dashboard counters rebuilt: {counters['total']} equipment records")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
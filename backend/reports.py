@@ -0,0 +1,149 @@
+"""Technician workload and time-to-repair report.
+
+A record is under repair from the moment its estado_equipo becomes
+en_reparacion until it returns to operativo. Writes stamp those transitions
+(repair_started_at, repaired_at) on the record itself, so the report is a
+handful of aggregation pipelines over indexed fields: maintenances by fecha,
+closed repairs by repaired_at and open repairs by estado_equipo.
+"""
+import csv
+import io
+from datetime import datetime
+from typing import Dict, List
+
+from openpyxl import Workbook
+from pymongo import ASCENDING, IndexModel
+
+REPAIR_STATE = "en_reparacion"
+REPAIRED_STATE = "operativo"
+
+# Every record stores repaired_at, null until a repair closes, so only the
+# dates are indexed; queries repeat the $type condition to use the index
+REPAIRED_AT_INDEXED = {"repaired_at": {"$type": "date"}}
+
+REPORT_INDEXES = [
+    IndexModel([("repaired_at", ASCENDING)], name="repaired_at", partialFilterExpression=REPAIRED_AT_INDEXED),
+]
+
+REPORT_SHEET_NAME = "Técnicos"
+
+# Report columns as (header, key) pairs
+REPORT_COLUMNS = [
+    ("Técnico Responsable", "tecnico_responsable"),
+    ("Mantenimientos", "maintenances"),
+    ("Preventivos", "preventivo"),
+    ("Correctivos", "correctivo"),
+    ("Limpiezas", "limpieza"),
+    ("Equipos Atendidos", "assets"),
+    ("Reparaciones Cerradas", "repairs"),
+    ("MTTR (horas)", "mttr_hours"),
+    ("Reparación Máxima (horas)", "max_repair_hours"),
+    ("Reparaciones Abiertas", "open_repairs"),
+]
+
+REPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+def repair_stamps(before: str, after: str, at: datetime) -> dict:
+    # Fields to set on a record whose estado_equipo goes from before to after
+    if after == REPAIR_STATE and before != REPAIR_STATE:
+        return {"repair_started_at": at, "repaired_at": None}
+    if before == REPAIR_STATE and after == REPAIRED_STATE:
+        return {"repaired_at": at}
+    return {}
+
+def workload_pipeline(start: datetime, end: datetime) -> list:
+    return [
+        {"$match": {"fecha": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": "$tecnico_responsable",
+            "maintenances": {"$sum": 1},
+            "preventivo": {"$sum": {"$cond": [{"$eq": ["$tipo_mantenimiento", "preventivo"]}, 1, 0]}},
+            "correctivo": {"$sum": {"$cond": [{"$eq": ["$tipo_mantenimiento", "correctivo"]}, 1, 0]}},
+            "limpieza": {"$sum": {"$cond": [{"$eq": ["$tipo_mantenimiento", "limpieza"]}, 1, 0]}},
+            "series": {"$addToSet": "$serie"},
+        }},
+        {"$project": {
+            "maintenances": 1, "preventivo": 1, "correctivo": 1, "limpieza": 1,
+            "assets": {"$size": "$series"},
+        }},
+    ]
+
+def repair_pipeline(start: datetime, end: datetime) -> list:
+    # Repairs closed in the range, timed from the stamped transitions
+    return [
+        {"$match": {"repaired_at": {"$type": "date", "$gte": start, "$lt": end}, "repair_started_at": {"$ne": None}}},
+        {"$project": {
+            "tecnico_responsable": 1,
+            "hours": {"$divide": [{"$subtract": ["$repaired_at", "$repair_started_at"]}, 3600000]},
+        }},
+        {"$group": {
+            "_id": "$tecnico_responsable",
+            "repairs": {"$sum": 1},
+            "total_hours": {"$sum": "$hours"},
+            "max_repair_hours": {"$max": "$hours"},
+        }},
+    ]
+
+def open_repairs_pipeline() -> list:
+    # Current backlog, whatever the range
+    return [
+        {"$match": {"estado_equipo": REPAIR_STATE}},
+        {"$group": {"_id": "$tecnico_responsable", "open_repairs": {"$sum": 1}}},
+    ]
+
+def merge_report(workload: List[dict], repairs: List[dict], open_repairs: List[dict]) -> Dict:
+    rows: Dict[str, dict] = {}
+
+    def row(technician) -> dict:
+        technician = technician or ""
+        if technician not in rows:
+            rows[technician] = {
+                "tecnico_responsable": technician, "maintenances": 0, "preventivo": 0, "correctivo": 0,
+                "limpieza": 0, "assets": 0, "repairs": 0, "mttr_hours": None, "max_repair_hours": None,
+                "open_repairs": 0,
+            }
+        return rows[technician]
+
+    for group in workload:
+        row(group["_id"]).update({key: value for key, value in group.items() if key != "_id"})
+    total_repairs, total_hours = 0, 0.0
+    for group in repairs:
+        row(group["_id"]).update({
+            "repairs": group["repairs"],
+            "mttr_hours": round(group["total_hours"] / group["repairs"], 2),
+            "max_repair_hours": round(group["max_repair_hours"], 2),
+        })
+        total_repairs += group["repairs"]
+        total_hours += group["total_hours"]
+    for group in open_repairs:
+        row(group["_id"])["open_repairs"] = group["open_repairs"]
+
+    return {
+        "technicians": sorted(rows.values(), key=lambda item: (-item["maintenances"], item["tecnico_responsable"])),
+        "repairs": total_repairs,
+        "mttr_hours": round(total_hours / total_repairs, 2) if total_repairs else None,
+    }
+
+def report_csv(technicians: List[dict]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in REPORT_COLUMNS])
+    writer.writerows([row[key] for _, key in REPORT_COLUMNS] for row in technicians)
+    return buffer.getvalue().encode("utf-8")
+
+def report_xlsx(technicians: List[dict]) -> bytes:
+    # One row per technician, small enough to build in memory
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = REPORT_SHEET_NAME
+    sheet.append([header for header, _ in REPORT_COLUMNS])
+    for row in technicians:
+        sheet.append([row[key] for _, key in REPORT_COLUMNS])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+REPORT_WRITERS = {"csv": report_csv, "xlsx": report_xlsx}
@@ -0,0 +1,151 @@
+"""Daily rollups of maintenance records for trend charts.
+
+One document per (day, dimension, value) counts the maintenances whose fecha
+falls on that UTC day. Writes apply +1/-1 deltas for the records as saved and
+as they were before and stamp touched_at; a rebuild recounts everything in a
+single streamed pass and leaves buckets touched while it ran to the deltas.
+Reads touch one document per bucket, never the records themselves.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Group-bys offered by the time-series endpoint; "total" counts every record
+ROLLUP_DIMENSIONS = ("area", "equipment_type", "tecnico_responsable", "tipo_mantenimiento")
+TOTAL_DIMENSION = "total"
+
+ROLLUP_FIELDS = ("fecha",) + ROLLUP_DIMENSIONS
+
+ROLLUP_INDEXES = [
+    IndexModel([("dimension", ASCENDING), ("day", ASCENDING)], name="dimension_day"),
+    IndexModel([("rebuilt_at", ASCENDING)], name="rebuilt_at"),
+]
+
+INTERVALS = ("day", "week", "month")
+
+def day_of(value: datetime) -> datetime:
+    return datetime(value.year, value.month, value.day)
+
+def period_of(day: datetime, interval: str) -> datetime:
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+def next_period(period: datetime, interval: str) -> datetime:
+    if interval == "week":
+        return period + timedelta(days=7)
+    if interval == "month":
+        return (period + timedelta(days=32)).replace(day=1)
+    return period + timedelta(days=1)
+
+def rollup_id(day: datetime, dimension: str, value) -> str:
+    return f"{day.date().isoformat()}|{dimension}|{value}"
+
+def count_rollups(deltas: Dict[Tuple[datetime, str, str], int], equipment: dict, sign: int):
+    fecha = equipment.get("fecha")
+    if not isinstance(fecha, datetime):
+        return
+    day = day_of(fecha)
+    buckets = [(day, TOTAL_DIMENSION, "")]
+    buckets.extend((day, dimension, equipment.get(dimension) or "") for dimension in ROLLUP_DIMENSIONS)
+    for bucket in buckets:
+        deltas[bucket] = deltas.get(bucket, 0) + sign
+
+async def apply_rollup_changes(database, saved: Iterable[dict], previous: Iterable[dict]):
+    # Unchanged buckets cancel out, so an update that keeps fecha and the
+    # grouped fields writes nothing
+    deltas: Dict[Tuple[datetime, str, str], int] = {}
+    for equipment in previous:
+        count_rollups(deltas, equipment, -1)
+    for equipment in saved:
+        count_rollups(deltas, equipment, 1)
+    touched_at = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"_id": rollup_id(day, dimension, value)},
+            {
+                "$inc": {"count": delta},
+                "$set": {"touched_at": touched_at},
+                "$setOnInsert": {"day": day, "dimension": dimension, "value": value}
+            },
+            upsert=True
+        )
+        for (day, dimension, value), delta in deltas.items() if delta
+    ]
+    if operations:
+        await database.daily_rollups.bulk_write(operations, ordered=False)
+
+def untouched_since(started_at: datetime) -> dict:
+    return {"$or": [{"touched_at": {"$lt": started_at}}, {"touched_at": {"$exists": False}}]}
+
+async def write_rebuilt(database, operations: List[UpdateOne]):
+    try:
+        await database.daily_rollups.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # The upsert of a bucket touched during the rebuild collides with the
+        # bucket itself; its count keeps the deltas applied meanwhile
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+            raise
+
+async def rebuild_rollups(database, batch_size: int = 1000) -> int:
+    # Counts live in memory per bucket (days x distinct values), not per
+    # record. Buckets written by apply_rollup_changes while the scan runs are
+    # neither overwritten nor deleted.
+    started_at = datetime.utcnow()
+    deltas: Dict[Tuple[datetime, str, str], int] = {}
+    projection = {"_id": 0, **{field: 1 for field in ROLLUP_FIELDS}}
+    async for equipment in database.equipment.find({}, projection).batch_size(batch_size):
+        count_rollups(deltas, equipment, 1)
+
+    operations = []
+    for (day, dimension, value), count in deltas.items():
+        operations.append(UpdateOne(
+            {"_id": rollup_id(day, dimension, value), **untouched_since(started_at)},
+            {"$set": {"day": day, "dimension": dimension, "value": value, "count": count, "rebuilt_at": started_at}},
+            upsert=True
+        ))
+        if len(operations) >= batch_size:
+            await write_rebuilt(database, operations)
+            operations = []
+    if operations:
+        await write_rebuilt(database, operations)
+    # Buckets left from records that no longer exist
+    await database.daily_rollups.delete_many({"$and": [
+        {"$or": [{"rebuilt_at": {"$lt": started_at}}, {"rebuilt_at": {"$exists": False}}]},
+        untouched_since(started_at),
+    ]})
+    return len(deltas)
+
+async def load_timeseries(database, dimension: str, start: datetime, end: datetime,
+                          interval: str) -> Tuple[List[datetime], Dict[str, Dict[datetime, int]]]:
+    # Buckets in [start, end) folded into periods; every series covers every period
+    periods = []
+    period = period_of(day_of(start), interval)
+    while period < end:
+        periods.append(period)
+        period = next_period(period, interval)
+
+    series: Dict[str, Dict[datetime, int]] = {}
+    cursor = database.daily_rollups.find(
+        {"dimension": dimension, "day": {"$gte": day_of(start), "$lt": end}},
+        {"_id": 0, "day": 1, "value": 1, "count": 1}
+    )
+    async for bucket in cursor:
+        if not bucket["count"]:
+            continue
+        points = series.setdefault(bucket["value"], dict.fromkeys(periods, 0))
+        points[period_of(bucket["day"], interval)] += bucket["count"]
+    return periods, series
+
+def default_range(months: int = 12, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    today = day_of(now or datetime.utcnow())
+    start = today.replace(day=1)
+    for _ in range(months - 1):
+        start = (start - timedelta(days=1)).replace(day=1)
+    return start, today + timedelta(days=1)
@@ -0,0 +1,217 @@
+"""In-memory inverted index for equipment typeahead.
+
+Tokens from the searchable fields map to the ids of the records that
+contain them. A sorted token list answers prefix lookups with bisect.
+Memory is bounded by the number of records and tokens per record; tokens
+are interned so each is stored once, tokens held by a single record store
+its id directly instead of a set, and summaries are tuples that carry the
+normalized identifiers used for ranking. Suggestions look at a small
+multiple of the requested results, so their cost does not grow with the
+index, and the footprint is counted as records come and go.
+"""
+import heapq
+import re
+import sys
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Set, Tuple, Union
+
+SEARCHABLE_FIELDS = ("serie", "nombre_pc", "marca", "modelo", "area", "observaciones")
+# Fields also indexed whole, so a full serial such as "ABC-9.1" is a single token
+IDENTIFIER_FIELDS = ("serie", "nombre_pc")
+SUMMARY_FIELDS = ("id", "serie", "nombre_pc", "marca", "modelo", "area", "equipment_type")
+# Summary fields with few distinct values, interned so records share them
+SHARED_SUMMARY_FIELDS = ("marca", "modelo", "area", "equipment_type")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Records ranked per requested suggestion
+CANDIDATES_PER_RESULT = 5
+
+# Approximate bytes per entry of the dicts, sets and lists, which
+# sys.getsizeof does not attribute to their contents
+DICT_ENTRY_BYTES = 72
+SET_ENTRY_BYTES = 48
+LIST_ENTRY_BYTES = 8
+
+# Joins a record's tokens into one string, so checking a term against the
+# record is a substring search
+TOKEN_SEPARATOR = "\x1f"
+
+def normalize_text(value) -> str:
+    text = unicodedata.normalize("NFKD", str(value or "").lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+def tokenize(value) -> List[str]:
+    return TOKEN_PATTERN.findall(normalize_text(value))
+
+class EquipmentSearchIndex:
+    def __init__(self, max_documents: int = 100000, max_tokens_per_document: int = 64):
+        self.max_documents = max_documents
+        self.max_tokens_per_document = max_tokens_per_document
+        self.postings: Dict[str, Union[str, Set[str]]] = {}
+        self.sorted_tokens: List[str] = []
+        self.sorted = True
+        # Each record's tokens, every one preceded by TOKEN_SEPARATOR
+        self.document_tokens: Dict[str, str] = {}
+        # SUMMARY_FIELDS values followed by the normalized serie and nombre_pc
+        self.summaries: Dict[str, tuple] = {}
+        self.truncated = False
+        self.posting_count = 0
+        self.approximate_bytes = 0
+
+    def identifier_keys(self, equipment: dict) -> Tuple[str, ...]:
+        return tuple(
+            sys.intern(normalize_text(equipment.get(field)).replace(TOKEN_SEPARATOR, " ").strip())
+            for field in IDENTIFIER_FIELDS
+        )
+
+    def document_tokens_for(self, equipment: dict, identifiers: Tuple[str, ...]) -> Tuple[str, ...]:
+        tokens = [identifier for identifier in identifiers if identifier]
+        for field in SEARCHABLE_FIELDS:
+            tokens.extend(tokenize(equipment.get(field)))
+        # Keep the first occurrence order so identifiers survive the cap
+        return tuple(sys.intern(token) for token in dict.fromkeys(tokens))[:self.max_tokens_per_document]
+
+    def document_bytes(self, joined_tokens: str, summary: tuple) -> int:
+        # Strings shared with other records (interned tokens, the id) are
+        # counted where they are first stored
+        size = sys.getsizeof(joined_tokens) + sys.getsizeof(summary) + 2 * DICT_ENTRY_BYTES
+        return size + sum(
+            sys.getsizeof(value) for field, value in zip(SUMMARY_FIELDS[1:], summary[1:])
+            if value is not None and field not in SHARED_SUMMARY_FIELDS
+        )
+
+    def add(self, equipment: dict, keep_sorted: bool = True):
+        # Bulk loads pass keep_sorted=False and call finalize() once at the end
+        equipment_id = equipment["id"]
+        self.remove(equipment_id)
+        if len(self.document_tokens) >= self.max_documents:
+            self.truncated = True
+            return
+        identifiers = self.identifier_keys(equipment)
+        tokens = self.document_tokens_for(equipment, identifiers)
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                self.postings[token] = equipment_id
+                self.approximate_bytes += sys.getsizeof(token) + DICT_ENTRY_BYTES + LIST_ENTRY_BYTES
+                if keep_sorted:
+                    insort(self.sorted_tokens, token)
+                else:
+                    self.sorted = False
+            elif isinstance(posting, str):
+                self.postings[token] = {posting, equipment_id}
+                self.approximate_bytes += sys.getsizeof(set()) + 2 * SET_ENTRY_BYTES
+            else:
+                posting.add(equipment_id)
+                self.approximate_bytes += SET_ENTRY_BYTES
+        summary = tuple(
+            sys.intern(value) if field in SHARED_SUMMARY_FIELDS and isinstance(value, str) else value
+            for field, value in ((field, equipment.get(field)) for field in SUMMARY_FIELDS)
+        ) + identifiers
+        joined_tokens = "".join(TOKEN_SEPARATOR + token for token in tokens)
+        self.document_tokens[equipment_id] = joined_tokens
+        self.summaries[equipment_id] = summary
+        self.posting_count += len(tokens)
+        self.approximate_bytes += sys.getsizeof(equipment_id) + self.document_bytes(joined_tokens, summary)
+
+    def finalize(self):
+        if not self.sorted:
+            self.sorted_tokens = sorted(self.postings)
+            self.sorted = True
+
+    def remove(self, equipment_id: str):
+        joined_tokens = self.document_tokens.pop(equipment_id, None)
+        if joined_tokens is None:
+            return
+        summary = self.summaries.pop(equipment_id)
+        tokens = joined_tokens.split(TOKEN_SEPARATOR)[1:]
+        self.posting_count -= len(tokens)
+        self.approximate_bytes -= sys.getsizeof(equipment_id) + self.document_bytes(joined_tokens, summary)
+        for token in tokens:
+            posting = self.postings[token]
+            if isinstance(posting, str):
+                del self.postings[token]
+                self.approximate_bytes -= sys.getsizeof(token) + DICT_ENTRY_BYTES + LIST_ENTRY_BYTES
+                if self.sorted:
+                    del self.sorted_tokens[bisect_left(self.sorted_tokens, token)]
+            else:
+                posting.discard(equipment_id)
+                self.approximate_bytes -= SET_ENTRY_BYTES
+                if len(posting) == 1:
+                    self.postings[token] = next(iter(posting))
+                    self.approximate_bytes -= sys.getsizeof(set()) + SET_ENTRY_BYTES
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        # Positions in sorted_tokens of the tokens starting with prefix
+        return bisect_left(self.sorted_tokens, prefix), bisect_left(self.sorted_tokens, prefix + "\uffff")
+
+    def prefix_ids(self, prefix: str) -> Iterator[str]:
+        # Ids holding a token that starts with prefix; an id may repeat
+        start, end = self.prefix_range(prefix)
+        for position in range(start, end):
+            posting = self.postings[self.sorted_tokens[position]]
+            if isinstance(posting, str):
+                yield posting
+            else:
+                yield from posting
+
+    def matches_all(self, equipment_id: str, terms: List[str]) -> bool:
+        joined_tokens = self.document_tokens.get(equipment_id, "")
+        return all(TOKEN_SEPARATOR + term in joined_tokens for term in terms)
+
+    def collect(self, ids: Iterator[str], terms: List[str], candidates: Set[str], max_candidates: int):
+        for equipment_id in ids:
+            if len(candidates) >= max_candidates:
+                return
+            if equipment_id not in candidates and self.matches_all(equipment_id, terms):
+                candidates.add(equipment_id)
+
+    def suggest(self, text: str, limit: int = 10) -> List[dict]:
+        whole = normalize_text(text).strip()
+        terms = list(dict.fromkeys(tokenize(text)))
+        if not whole:
+            return []
+
+        # The whole input may prefix-match an identifier such as a full serial
+        # number; those rank first, so they are collected first. Other
+        # candidates come from the term matching the fewest tokens, with the
+        # remaining terms checked against each candidate's own tokens.
+        max_candidates = limit * CANDIDATES_PER_RESULT
+        candidates: Set[str] = set()
+        self.collect(self.prefix_ids(whole), [], candidates, max_candidates)
+        if terms:
+            widths = {term: len(range(*self.prefix_range(term))) for term in terms}
+            selective = min(terms, key=widths.get)
+            others = [term for term in terms if term != selective]
+            self.collect(self.prefix_ids(selective), others, candidates, max_candidates)
+
+        serie_key, nombre_pc_key = len(SUMMARY_FIELDS), len(SUMMARY_FIELDS) + 1
+
+        def rank(equipment_id: str):
+            summary = self.summaries[equipment_id]
+            serie, nombre_pc = summary[serie_key], summary[nombre_pc_key]
+            return (
+                whole not in (serie, nombre_pc),
+                not (serie.startswith(whole) or nombre_pc.startswith(whole)),
+                serie,
+            )
+
+        return [
+            dict(zip(SUMMARY_FIELDS, self.summaries[equipment_id]))
+            for equipment_id in heapq.nsmallest(limit, candidates, key=rank)
+        ]
+
+    def stats(self) -> dict:
+        # Kept up to date by add and remove; the containers themselves are
+        # the only part measured here
+        size = self.approximate_bytes + sys.getsizeof(self.sorted_tokens)
+        size += sys.getsizeof(self.postings) + sys.getsizeof(self.document_tokens) + sys.getsizeof(self.summaries)
+        return {
+            "documents": len(self.document_tokens),
+            "tokens": len(self.postings),
+            "postings": self.posting_count,
+            "approximate_bytes": size,
+            "truncated": self.truncated,
+        }
@@ -0,0 +1,36 @@
+"""JSON encoding for responses built from trusted database rows.
+
+Documents read from Mongo were validated when they were written, so list
+endpoints encode them directly instead of rebuilding pydantic models and
+letting FastAPI validate and encode them again. orjson is used when it is
+installed; it serializes datetimes natively.
+"""
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class EncodedJSONResponse(Response):
+    # Content is already encoded with dumps(), typically a cached body
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
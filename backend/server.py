@@ -1,22 +1,51 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Query, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, InsertOne, UpdateOne, DeleteOne, ReturnDocument
+from pymongo.errors import OperationFailure, BulkWriteError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Dict, Any, Union
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
 from passlib.context import CryptContext
-import pandas as pd
-import io
+import tempfile
+import asyncio
+import hashlib
+import ipaddress
+import secrets
+import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import base64
 from bson import ObjectId
 import json
+from exports import EXPORT_WRITERS, csv_chunk, run_export_job
+from importers import IMPORT_READERS, read_chunk
+from cache import MemoryCacheBackend, ResponseCache, make_cache_key
+from search_index import EquipmentSearchIndex, SEARCHABLE_FIELDS, SUMMARY_FIELDS
+from serialization import EncodedJSONResponse, dumps
+from queries import EQUALITY_INDEXES, EQUIPMENT_SORT, InvalidFilter, QueryPlan, QueryPlanner
+from assets import ASSET_EVENT_SORT, ASSET_INDEXES, EVENT_INDEXES, migrate_assets, refresh_assets
+from scheduler import SCHEDULE_INDEXES, recompute_due_dates, reschedule_if_intervals_changed
+from rollups import (
+    INTERVALS, ROLLUP_DIMENSIONS, ROLLUP_INDEXES, TOTAL_DIMENSION, apply_rollup_changes,
+    day_of, default_range, load_timeseries, rebuild_rollups
+)
+from reports import (
+    REPAIR_STATE, REPORT_INDEXES, REPORT_MEDIA_TYPES, REPORT_WRITERS, merge_report, open_repairs_pipeline,
+    repair_pipeline, repair_stamps, workload_pipeline
+)
+from events import EventBus, stream_events, watch_changes
+from audit import AUDIT_SORT, AuditWriter, audit_entry, audit_indexes, equipment_audit_entries, field_diff
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -30,8 +59,93 @@ db = client.get_database("mantenimiento_equipos")
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-this')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get('REFRESH_TOKEN_EXPIRE_DAYS', '7'))
+
+# Background exports
+EXPORT_DIR = Path(os.environ.get('EXPORT_DIR', Path(tempfile.gettempdir()) / 'mantenimiento_exports'))
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '2'))
+EXPORT_CACHE_MINUTES = int(os.environ.get('EXPORT_CACHE_MINUTES', '15'))
+
+# Spawned workers only import the exports module, not the API
+export_pool = ProcessPoolExecutor(max_workers=EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+export_tasks = set()
+
+# Response cache for list and dashboard reads, dropped on every equipment write
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', '10'))
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '1024'))
+response_cache = ResponseCache(MemoryCacheBackend(RESPONSE_CACHE_SIZE), ttl=RESPONSE_CACHE_TTL)
+
+# Resolved principals for get_current_user, dropped whenever the user changes
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', '60'))
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', '1024'))
+user_cache = ResponseCache(MemoryCacheBackend(AUTH_CACHE_SIZE), ttl=AUTH_CACHE_TTL)
+
+# Built queries memoized by normalized filter
+QUERY_PLAN_CACHE_SIZE = int(os.environ.get('QUERY_PLAN_CACHE_SIZE', '512'))
+query_planner = QueryPlanner(QUERY_PLAN_CACHE_SIZE)
+
+# Password hashing. bcrypt runs on a bounded thread pool (it releases the GIL)
+# and min = max rounds makes every hash with a different cost "need update"
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '64'))
+PASSWORD_HASH_PER_CLIENT = int(os.environ.get('PASSWORD_HASH_PER_CLIENT', '2'))
+# Proxies (addresses or CIDR ranges) whose X-Forwarded-For is believed when
+# telling clients apart, e.g. the ingress in front of the API
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.environ.get('TRUSTED_PROXIES', '').split(',') if proxy.strip()
+]
+
+# Typeahead index held in memory per worker, rebuilt periodically so writes
+# made through other workers are picked up. It takes roughly 2 KB per record,
+# and a rebuild holds a second copy until it is swapped in.
+SEARCH_INDEX_ENABLED = os.environ.get('SEARCH_INDEX_ENABLED', '1') == '1'
+SEARCH_INDEX_MAX_DOCUMENTS = int(os.environ.get('SEARCH_INDEX_MAX_DOCUMENTS', '100000'))
+SEARCH_INDEX_REBUILD_MINUTES = int(os.environ.get('SEARCH_INDEX_REBUILD_MINUTES', '15'))
+search_index = EquipmentSearchIndex(max_documents=SEARCH_INDEX_MAX_DOCUMENTS)
+search_index_state = {"ready": False, "building": False, "pending": [], "built_at": None}
+background_tasks = set()
+
+# Days between preventive maintenances per equipment type. Due dates are
+# recomputed by a background task, woken on equipment writes and otherwise
+# run every PREVENTIVE_SCHEDULER_SECONDS.
+PREVENTIVE_INTERVAL_DAYS = {
+    "cpu": int(os.environ.get('PREVENTIVE_INTERVAL_DAYS_CPU', '180')),
+    "monitor": int(os.environ.get('PREVENTIVE_INTERVAL_DAYS_MONITOR', '365')),
+    "impresora": int(os.environ.get('PREVENTIVE_INTERVAL_DAYS_IMPRESORA', '90')),
+}
+PREVENTIVE_SCHEDULER_SECONDS = int(os.environ.get('PREVENTIVE_SCHEDULER_SECONDS', '300'))
+schedule_wakeup = asyncio.Event()
+
+# Audit log: entries are batched off the request path and expire after
+# AUDIT_RETENTION_DAYS (0 keeps them forever)
+AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', '730'))
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', '1'))
+audit_writer = AuditWriter(db.audit_log, flush_seconds=AUDIT_FLUSH_SECONDS)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Change feed for /api/events. Writes publish to the in-process bus; with
+# EVENTS_CHANGE_STREAM=1 (replica sets only) MongoDB change streams feed it
+# instead, so clients of every API process see every write.
+EVENTS_HISTORY_SIZE = int(os.environ.get('EVENTS_HISTORY_SIZE', '1000'))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', '15'))
+EVENTS_CHANGE_STREAM = os.environ.get('EVENTS_CHANGE_STREAM', '0') == '1'
+# Larger writes (imports, big batches) publish a single "reload" instead of one event per record
+EVENTS_MAX_BATCH = int(os.environ.get('EVENTS_MAX_BATCH', '100'))
+# EventSource cannot send headers: streams are opened with a single-use ticket
+# instead of the access token, which would end up in access logs
+EVENTS_TICKET_SECONDS = int(os.environ.get('EVENTS_TICKET_SECONDS', '30'))
+event_bus = EventBus(history_size=EVENTS_HISTORY_SIZE)
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+password_tasks_by_client: Dict[str, int] = {}
 security = HTTPBearer()
 
 # Create the main app without a prefix
@@ -86,8 +200,12 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
     user: Dict[str, Any]
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class Equipment(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     area: str
@@ -105,6 +223,9 @@ class Equipment(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
     updated_by: Optional[str] = None
+    # Stamped when estado_equipo enters en_reparacion and when it returns to operativo
+    repair_started_at: Optional[datetime] = None
+    repaired_at: Optional[datetime] = None
 
 class EquipmentCreate(BaseModel):
     area: str
@@ -127,6 +248,103 @@ class EquipmentUpdate(BaseModel):
     observaciones: Optional[str] = None
     estado_equipo: Optional[str] = None
 
+class EquipmentBatchUpdate(BaseModel):
+    id: str
+    changes: EquipmentUpdate
+
+class EquipmentBatch(BaseModel):
+    create: List[EquipmentCreate] = []
+    update: List[EquipmentBatchUpdate] = []
+    delete: List[str] = []
+
+class EquipmentBatchItemResult(BaseModel):
+    operation: str  # "create", "update", "delete"
+    index: int
+    id: Optional[str] = None
+    status: str  # "ok", "not_found", "error"
+    error: Optional[str] = None
+    equipment: Optional[Equipment] = None
+
+class EquipmentBatchResult(BaseModel):
+    results: List[EquipmentBatchItemResult]
+
+class AssetMaintenance(BaseModel):
+    id: str
+    fecha: datetime
+    tipo_mantenimiento: Optional[str] = None
+    tecnico_responsable: Optional[str] = None
+
+class Asset(BaseModel):
+    serie: str
+    area: Optional[str] = None
+    equipment_type: Optional[str] = None
+    nombre_pc: Optional[str] = None
+    marca: Optional[str] = None
+    modelo: Optional[str] = None
+    estado_equipo: Optional[str] = None
+    last_maintenance: AssetMaintenance
+    last_maintenance_at: datetime
+    first_maintenance_at: datetime
+    last_by_type: Dict[str, Optional[datetime]]
+    maintenance_count: int
+    next_due: Optional[datetime] = None
+
+class DueAssets(BaseModel):
+    as_of: datetime
+    overdue: List[Asset]
+    upcoming: List[Asset]
+
+class TimeseriesSeries(BaseModel):
+    value: str
+    total: int
+    # One count per period, aligned with Timeseries.periods
+    points: List[int]
+
+class Timeseries(BaseModel):
+    interval: str
+    group_by: str
+    start: datetime
+    end: datetime
+    periods: List[datetime]
+    series: List[TimeseriesSeries]
+
+class AuditChange(BaseModel):
+    field: str
+    old: Any = None
+    new: Any = None
+
+class AuditEntry(BaseModel):
+    id: str
+    entity: str  # "equipment", "user"
+    entity_id: str
+    action: str  # "create", "update", "delete", "reset_password", "change_password"
+    actor: str
+    at: datetime
+    changes: List[AuditChange]
+
+class AuditPage(BaseModel):
+    items: List[AuditEntry]
+    next_cursor: Optional[str] = None
+
+class TechnicianWorkload(BaseModel):
+    tecnico_responsable: str
+    maintenances: int
+    preventivo: int
+    correctivo: int
+    limpieza: int
+    assets: int
+    repairs: int
+    mttr_hours: Optional[float] = None
+    max_repair_hours: Optional[float] = None
+    open_repairs: int
+
+class TechnicianReport(BaseModel):
+    start: datetime
+    end: datetime
+    repairs: int
+    mttr_hours: Optional[float] = None
+    technicians: List[TechnicianWorkload]
+
 class EquipmentFilter(BaseModel):
     equipment_type: Optional[str] = None
     area: Optional[str] = None
@@ -135,6 +353,7 @@ class EquipmentFilter(BaseModel):
     fecha_inicio: Optional[datetime] = None
     fecha_fin: Optional[datetime] = None
     search: Optional[str] = None
+    search_mode: Optional[str] = None  # "contains" (default), "text", "exact", "prefix"
 
 class DashboardStats(BaseModel):
     total_equipments: int
@@ -143,6 +362,32 @@ class DashboardStats(BaseModel):
     maintenance_by_type: Dict[str, int]
     recent_maintenances: List[Dict]
 
+class ExportJob(BaseModel):
+    id: str
+    status: str  # "pending", "running", "completed", "failed", "expired"
+    format: str
+    filters: Dict[str, Any]
+    processed: int = 0
+    total: Optional[int] = None
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+class EquipmentPage(BaseModel):
+    items: List[Equipment]
+    next_cursor: Optional[str] = None
+    # Only filled when the client asks for them
+    total: Optional[int] = None
+    facets: Optional[Dict[str, Dict[str, int]]] = None
+
+class EquipmentFieldsPage(BaseModel):
+    # Same page shape for projected views, whose items carry only the requested fields
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    facets: Optional[Dict[str, Dict[str, int]]] = None
+
 # Utility functions
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -150,6 +395,50 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+def client_address(request: Request) -> str:
+    # The peer, or behind trusted proxies the nearest X-Forwarded-For hop
+    # they did not add themselves; hops further left are client-supplied
+    address = request.client.host if request.client else "unknown"
+    if not is_trusted_proxy(address):
+        return address
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(forwarded):
+        address = hop
+        if not is_trusted_proxy(hop):
+            break
+    return address
+
+@asynccontextmanager
+async def password_hash_slot(request: Request):
+    # Backpressure: a client may only have a few hashes in flight, and the
+    # pool only queues so much work before new requests are turned away
+    client_ip = client_address(request)
+    pending = sum(password_tasks_by_client.values())
+    if pending >= PASSWORD_HASH_MAX_PENDING or password_tasks_by_client.get(client_ip, 0) >= PASSWORD_HASH_PER_CLIENT:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many password operations in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    password_tasks_by_client[client_ip] = password_tasks_by_client.get(client_ip, 0) + 1
+    try:
+        yield
+    finally:
+        password_tasks_by_client[client_ip] -= 1
+        if not password_tasks_by_client[client_ip]:
+            del password_tasks_by_client[client_ip]
+
+async def run_password_task(request: Request, func, *args):
+    async with password_hash_slot(request):
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -160,30 +449,181 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+# Keyset pagination: pages are ordered by EQUIPMENT_SORT, (created_at, id)
+# descending, and the cursor is the opaque position of the last row of the
+# previous page.
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(document: dict, field: str = "created_at") -> str:
+    position = {field: document[field].isoformat(), "id": document["id"]}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(cursor: str, field: str = "created_at") -> dict:
+    # Position after the document the cursor points at, in (field, id) descending order
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value = datetime.fromisoformat(position[field])
+        document_id = str(position["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return {
+        "$or": [
+            {field: {"$lt": value}},
+            {field: value, "id": {"$lt": document_id}}
+        ]
+    }
+
+def plan_equipment_query(filters: EquipmentFilter) -> QueryPlan:
+    try:
+        return query_planner.plan(filters.dict())
+    except InvalidFilter as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+# Compact representation for table views: everything but the long free text
+# and the audit fields
+EQUIPMENT_VIEWS = {
+    "summary": (
+        "area", "equipment_type", "nombre_pc", "marca", "modelo", "serie", "fecha",
+        "tipo_mantenimiento", "estado_equipo", "tecnico_responsable"
+    ),
+}
+
+# Stored fields that make up an Equipment; internal ones such as serie_lower stay in Mongo
+EQUIPMENT_PROJECTION = {"_id": 0, **{field: 1 for field in Equipment.model_fields}}
+# Values the Equipment model would fill in for records stored before a field existed
+EQUIPMENT_DEFAULTS = {
+    field: info.default for field, info in Equipment.model_fields.items()
+    if not info.is_required() and info.default_factory is None
+}
+
+def equipment_projection(view: str, fields: Optional[str]) -> Dict[str, int]:
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = sorted(set(requested) - set(Equipment.model_fields))
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown equipment fields: {', '.join(unknown)}"
+            )
+    elif view == "full":
+        return EQUIPMENT_PROJECTION
+    elif view in EQUIPMENT_VIEWS:
+        requested = EQUIPMENT_VIEWS[view]
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown view: {view}")
+    # id and created_at always come back because page cursors are built from them
+    return {"_id": 0, "id": 1, "created_at": 1, **{field: 1 for field in requested}}
+
+async def find_equipment_page(plan: QueryPlan, cursor: Optional[str], skip: int, limit: int,
+                              projection: Dict[str, int] = EQUIPMENT_PROJECTION):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = plan.query
+    if cursor:
+        keyset = decode_cursor(cursor)
+        query = {"$and": [query, keyset]} if query else keyset
+    
+    find = db.equipment.find(query, projection).sort(EQUIPMENT_SORT)
+    if plan.hint:
+        find = find.hint(plan.hint)
+    if cursor is None and skip:
+        # Legacy offset paging for clients that don't send a cursor
+        find = find.skip(skip)
+    documents = await find.limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+    return documents[:limit], next_cursor
+
+FILTER_FACET_FIELDS = ("equipment_type", "area", "estado_equipo", "tipo_mantenimiento")
+
+async def find_equipment_page_with_counts(plan: QueryPlan, cursor: Optional[str], skip: int, limit: int,
+                                          include_total: bool, include_facets: bool,
+                                          projection: Dict[str, int] = EQUIPMENT_PROJECTION):
+    # The page, the total and the facet counts come from one $facet pass over
+    # the matched records; the cursor only narrows the page branch
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    page = [{"$match": decode_cursor(cursor)}] if cursor else []
+    page.append({"$sort": dict(EQUIPMENT_SORT)})
+    if cursor is None and skip:
+        page.append({"$skip": skip})
+    page.append({"$limit": limit + 1})
+    page.append({"$project": projection})
+    
+    facets = {"page": page}
+    if include_total:
+        facets["total"] = [{"$count": "count"}]
+    if include_facets:
+        for field in FILTER_FACET_FIELDS:
+            facets[field] = [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]
+    pipeline = ([{"$match": plan.query}] if plan.query else []) + [{"$facet": facets}]
+    options = {"hint": plan.hint} if plan.hint else {}
+    result = (await db.equipment.aggregate(pipeline, **options).to_list(1))[0]
+    
+    documents = result["page"]
+    next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+    total = None
+    if include_total:
+        total = result["total"][0]["count"] if result["total"] else 0
+    counts = None
+    if include_facets:
+        counts = {field: counts_by_key(result[field]) for field in FILTER_FACET_FIELDS}
+    return documents[:limit], next_cursor, total, counts
+
+# Refresh tokens are opaque and stored hashed. Each use rotates the token within
+# its family; presenting an already rotated token revokes the whole family.
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+async def issue_refresh_token(username: str, family_id: Optional[str] = None) -> str:
+    refresh_token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    await db.refresh_tokens.insert_one({
+        "token_hash": hash_refresh_token(refresh_token),
+        "family_id": family_id or str(uuid.uuid4()),
+        "username": username,
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        "used_at": None,
+        "revoked": False
+    })
+    return refresh_token
+
+async def revoke_refresh_tokens(query: dict):
+    await db.refresh_tokens.update_many(
+        {**query, "revoked": False},
+        {"$set": {"revoked": True, "revoked_at": datetime.utcnow()}}
+    )
+
+async def load_user(username: str) -> Optional[User]:
+    user = await db.users.find_one({"username": username}, {"_id": 0, "password": 0})
+    return User(**user) if user else None
+
+async def user_from_token(token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except jwt.PyJWTError:
         raise credentials_exception
     
-    user = await db.users.find_one({"username": username})
+    user = await user_cache.get_or_compute(username, lambda: load_user(username))
     if user is None:
         raise credentials_exception
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Account is deactivated"
+        )
     
-    # Convert ObjectId to string and remove _id
-    user_data = {k: (str(v) if isinstance(v, ObjectId) else v) for k, v in user.items() if k != "password"}
-    if "_id" in user_data:
-        del user_data["_id"]
-    
-    return User(**user_data)
+    return user
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await user_from_token(credentials.credentials)
 
 async def get_admin_user(current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
@@ -195,7 +635,7 @@ async def get_admin_user(current_user: User = Depends(get_current_user)):
 
 # Routes
 @api_router.post("/register", response_model=User)
-async def register_user(user: UserCreate):
+async def register_user(user: UserCreate, request: Request):
     # Only allow normal user registration
     if user.role != "user":
         raise HTTPException(
@@ -212,7 +652,7 @@ async def register_user(user: UserCreate):
         )
     
     # Hash password
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_password_task(request, get_password_hash, user.password)
     
     # Create user
     user_data = user.dict()
@@ -221,12 +661,20 @@ async def register_user(user: UserCreate):
     
     # Insert in database
     await db.users.insert_one({**user_obj.dict(), "password": hashed_password})
+    await audit_writer.record([
+        audit_entry("user", user_obj.id, "create", user_obj.username, field_diff(None, {**user_obj.dict(), "password": hashed_password}))
+    ])
     return user_obj
 
 @api_router.post("/login", response_model=Token)
-async def login_user(user_credentials: UserLogin):
+async def login_user(user_credentials: UserLogin, request: Request):
     user = await db.users.find_one({"username": user_credentials.username})
-    if not user or not verify_password(user_credentials.password, user["password"]):
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await run_password_task(
+            request, pwd_context.verify_and_update, user_credentials.password, user["password"]
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -239,16 +687,21 @@ async def login_user(user_credentials: UserLogin):
             detail="Account is deactivated"
         )
     
-    # Update last login
+    # Update last login, rehashing when the configured bcrypt cost changed
+    login_update = {"last_login": datetime.utcnow()}
+    if new_hash:
+        login_update["password"] = new_hash
     await db.users.update_one(
         {"username": user_credentials.username},
-        {"$set": {"last_login": datetime.utcnow()}}
+        {"$set": login_update}
     )
+    await user_cache.invalidate_key(user["username"])
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user["username"]}, expires_delta=access_token_expires
     )
+    refresh_token = await issue_refresh_token(user["username"])
     
     # Convert ObjectId to string and remove password
     user_data = {k: (str(v) if isinstance(v, ObjectId) else v) for k, v in user.items() if k != "password"}
@@ -258,15 +711,67 @@ async def login_user(user_credentials: UserLogin):
     return {
         "access_token": access_token,
         "token_type": "bearer",
+        "refresh_token": refresh_token,
         "user": user_data
     }
 
+@api_router.post("/token/refresh", response_model=Token)
+async def refresh_access_token(refresh_request: RefreshRequest):
+    invalid_token_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_hash = hash_refresh_token(refresh_request.refresh_token)
+    now = datetime.utcnow()
+    
+    # Claim the token atomically so only its first presentation rotates it
+    stored_token = await db.refresh_tokens.find_one_and_update(
+        {"token_hash": token_hash, "used_at": None, "revoked": False, "expires_at": {"$gt": now}},
+        {"$set": {"used_at": now}}
+    )
+    if not stored_token:
+        previous_token = await db.refresh_tokens.find_one({"token_hash": token_hash})
+        if previous_token and previous_token.get("used_at") is not None:
+            # A rotated token came back: treat the session as stolen and end it
+            logging.warning(f"Refresh token reuse detected for user {previous_token['username']}")
+            await revoke_refresh_tokens({"family_id": previous_token["family_id"]})
+        raise invalid_token_exception
+    
+    # Renewal checks the account through the user cache; no password is verified
+    user = await user_cache.get_or_compute(stored_token["username"], lambda: load_user(stored_token["username"]))
+    if user is None or not user.is_active:
+        await revoke_refresh_tokens({"family_id": stored_token["family_id"]})
+        raise invalid_token_exception
+    
+    access_token = create_access_token(
+        data={"sub": user.username}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    refresh_token = await issue_refresh_token(user.username, stored_token["family_id"])
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "user": user.dict()
+    }
+
+@api_router.post("/logout")
+async def logout_user(refresh_request: RefreshRequest):
+    stored_token = await db.refresh_tokens.find_one({"token_hash": hash_refresh_token(refresh_request.refresh_token)})
+    if stored_token:
+        await revoke_refresh_tokens({"family_id": stored_token["family_id"]})
+    return {"message": "Logged out successfully"}
+
 @api_router.get("/me", response_model=User)
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @api_router.post("/admin/users", response_model=User)
-async def create_user_by_admin(user: UserCreateByAdmin, current_user: User = Depends(get_admin_user)):
+async def create_user_by_admin(
+    user: UserCreateByAdmin,
+    request: Request,
+    current_user: User = Depends(get_admin_user)
+):
     # Check if user exists
     existing_user = await db.users.find_one({"$or": [{"username": user.username}, {"email": user.email}]})
     if existing_user:
@@ -276,7 +781,7 @@ async def create_user_by_admin(user: UserCreateByAdmin, current_user: User = Dep
         )
     
     # Hash temporary password
-    hashed_password = get_password_hash(user.temporary_password)
+    hashed_password = await run_password_task(request, get_password_hash, user.temporary_password)
     
     # Create user with must_change_password flag
     user_data = {
@@ -295,6 +800,7 @@ async def create_user_by_admin(user: UserCreateByAdmin, current_user: User = Dep
     
     # Insert in database
     await db.users.insert_one(user_data)
+    await audit_writer.record([audit_entry("user", user_obj.id, "create", current_user.username, field_diff(None, user_data))])
     return user_obj
 
 @api_router.get("/admin/users", response_model=List[User])
@@ -321,6 +827,12 @@ async def update_user_by_admin(
     update_data = {k: v for k, v in user_update.dict().items() if v is not None}
     
     await db.users.update_one({"id": user_id}, {"$set": update_data})
+    await audit_writer.record([
+        audit_entry("user", user_id, "update", current_user.username, field_diff(user, {**user, **update_data}))
+    ])
+    await user_cache.invalidate_key(user["username"])
+    if update_data.get("is_active") is False:
+        await revoke_refresh_tokens({"username": user["username"]})
     
     updated_user = await db.users.find_one({"id": user_id})
     user_data = {k: (str(v) if isinstance(v, ObjectId) else v) for k, v in updated_user.items() if k != "password"}
@@ -332,39 +844,49 @@ async def update_user_by_admin(
 async def reset_user_password(
     user_id: str,
     password_reset: PasswordReset,
+    request: Request,
     current_user: User = Depends(get_admin_user)
 ):
     user = await db.users.find_one({"id": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    hashed_password = get_password_hash(password_reset.new_password)
+    hashed_password = await run_password_task(request, get_password_hash, password_reset.new_password)
     
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"password": hashed_password, "must_change_password": True}}
-    )
+    changes = {"password": hashed_password, "must_change_password": True}
+    await db.users.update_one({"id": user_id}, {"$set": changes})
+    await audit_writer.record([
+        audit_entry("user", user_id, "reset_password", current_user.username, field_diff(user, {**user, **changes}))
+    ])
+    await user_cache.invalidate_key(user["username"])
+    await revoke_refresh_tokens({"username": user["username"]})
     
     return {"message": "Password reset successfully. User must change password on next login."}
 
 @api_router.post("/change-password")
 async def change_password(
     password_change: PasswordChange,
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
     user = await db.users.find_one({"username": current_user.username})
-    if not user or not verify_password(password_change.current_password, user["password"]):
+    if not user or not await run_password_task(
+        request, verify_password, password_change.current_password, user["password"]
+    ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
-    hashed_password = get_password_hash(password_change.new_password)
+    hashed_password = await run_password_task(request, get_password_hash, password_change.new_password)
     
-    await db.users.update_one(
-        {"username": current_user.username},
-        {"$set": {"password": hashed_password, "must_change_password": False}}
-    )
+    changes = {"password": hashed_password, "must_change_password": False}
+    await db.users.update_one({"username": current_user.username}, {"$set": changes})
+    await audit_writer.record([
+        audit_entry("user", user["id"], "change_password", current_user.username, field_diff(user, {**user, **changes}))
+    ])
+    await user_cache.invalidate_key(current_user.username)
+    await revoke_refresh_tokens({"username": current_user.username})
     
     return {"message": "Password changed successfully"}
 
@@ -380,74 +902,375 @@ async def delete_user_by_admin(
             detail="Cannot delete your own account"
         )
     
-    result = await db.users.delete_one({"id": user_id})
-    if result.deleted_count == 0:
+    deleted_user = await db.users.find_one_and_delete({"id": user_id}, projection={"_id": 0})
+    if not deleted_user:
         raise HTTPException(status_code=404, detail="User not found")
+    await audit_writer.record([audit_entry("user", user_id, "delete", current_user.username, field_diff(deleted_user, None))])
+    await user_cache.invalidate_key(deleted_user["username"])
+    await revoke_refresh_tokens({"username": deleted_user["username"]})
     return {"message": "User deleted successfully"}
 
-@api_router.post("/equipment", response_model=Equipment)
-async def create_equipment(equipment: EquipmentCreate, current_user: User = Depends(get_current_user)):
+def search_fields(equipment_data: dict) -> dict:
+    # Lowercased copies of the lookup fields, so exact and prefix searches
+    # are served by an index instead of a case-insensitive regex
+    fields = {}
+    if "serie" in equipment_data:
+        fields["serie_lower"] = (equipment_data["serie"] or "").lower()
+    if "nombre_pc" in equipment_data:
+        fields["nombre_pc_lower"] = (equipment_data["nombre_pc"] or "").lower()
+    return fields
+
+def equipment_document(equipment_obj: Equipment) -> dict:
+    equipment_data = equipment_obj.dict()
+    return {**equipment_data, **search_fields(equipment_data)}
+
+def stamp_new_equipment(equipment: Equipment) -> Equipment:
+    # A record created under repair starts its repair at its own date
+    for field, value in repair_stamps(None, equipment.estado_equipo, equipment.fecha).items():
+        setattr(equipment, field, value)
+    return equipment
+
+def build_new_equipment(equipment: EquipmentCreate, current_user: User) -> Equipment:
     equipment_data = equipment.dict()
     equipment_data["fecha"] = datetime.utcnow()  # Set current date automatically
     equipment_data["created_by"] = current_user.username
     equipment_data["tecnico_responsable"] = current_user.full_name
+    return stamp_new_equipment(Equipment(**equipment_data))
+
+def build_equipment_changes(equipment_update: EquipmentUpdate, current_user: User) -> dict:
+    update_data = {k: v for k, v in equipment_update.dict().items() if v is not None}
+    update_data["updated_at"] = datetime.utcnow()
+    update_data["updated_by"] = current_user.username
+    update_data.update(search_fields(update_data))
+    return update_data
+
+# Dashboard counters live in one document updated with $inc by every write
+# path, so the unfiltered dashboard never scans the equipment collection
+DASHBOARD_COUNTERS_ID = "equipment"
+COUNTED_FIELDS = {
+    "by_type": "equipment_type",
+    "by_status": "estado_equipo",
+    "by_maintenance": "tipo_mantenimiento",
+}
+
+def counter_key(value) -> str:
+    # Field values become document keys, which may not contain "." or "$"
+    return str(value).replace(".", "\uff0e").replace("$", "\uff04")
+
+def counter_value_name(key: str) -> str:
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+def count_equipment(delta: dict, equipment: dict, sign: int, include_total: bool = True):
+    if include_total:
+        delta["total"] = delta.get("total", 0) + sign
+    for group, field in COUNTED_FIELDS.items():
+        key = f"{group}.{counter_key(equipment.get(field))}"
+        delta[key] = delta.get(key, 0) + sign
+
+def count_equipment_change(delta: dict, before: dict, after: dict):
+    # Unchanged fields cancel out, so only real transitions move counters
+    count_equipment(delta, before, -1, include_total=False)
+    count_equipment(delta, after, 1, include_total=False)
+
+async def apply_counter_deltas(delta: dict):
+    delta = {key: value for key, value in delta.items() if value}
+    if delta:
+        # version lets a reconcile tell that counters moved while it recounted
+        await db.dashboard_counters.update_one({"_id": DASHBOARD_COUNTERS_ID}, {"$inc": {**delta, "version": 1}}, upsert=True)
+
+def apply_search_index_changes(index: EquipmentSearchIndex, saved: list, deleted: list):
+    for equipment in saved:
+        index.add(equipment)
+    for equipment_id in deleted:
+        index.remove(equipment_id)
+
+# Dashboard field each counter group feeds
+DASHBOARD_COUNTER_FIELDS = {
+    "total": "total_equipments",
+    "by_type": "equipments_by_type",
+    "by_status": "equipments_by_status",
+    "by_maintenance": "maintenance_by_type",
+}
+
+def dashboard_counts(counters: dict) -> dict:
+    # Counter keys ("by_type.cpu") in DashboardStats shape; "total" stays a number
+    counts = {}
+    for key, value in counters.items():
+        group, _, name = key.partition(".")
+        if group not in DASHBOARD_COUNTER_FIELDS:
+            continue
+        if name:
+            counts.setdefault(DASHBOARD_COUNTER_FIELDS[group], {})[counter_value_name(name)] = value
+        else:
+            counts[DASHBOARD_COUNTER_FIELDS[group]] = value
+    return counts
+
+def equipment_event(equipment: dict) -> dict:
+    return {**EQUIPMENT_DEFAULTS, **{field: equipment[field] for field in Equipment.model_fields if field in equipment}}
+
+def publish_equipment_events(delta: dict, saved: list, deleted: list, previous: list):
+    if len(saved) + len(deleted) > EVENTS_MAX_BATCH:
+        event_bus.publish("equipment", {"action": "reload", "count": len(saved) + len(deleted)})
+    else:
+        previous_ids = {equipment["id"] for equipment in previous if equipment}
+        for equipment in saved:
+            event_bus.publish("equipment", {
+                "action": "update" if equipment["id"] in previous_ids else "create",
+                "id": equipment["id"],
+                "equipment": equipment_event(equipment)
+            })
+        for equipment_id in deleted:
+            event_bus.publish("equipment", {"action": "delete", "id": equipment_id})
+    delta = {key: value for key, value in delta.items() if value}
+    if delta:
+        event_bus.publish("dashboard", {"delta": dashboard_counts(delta)})
+
+async def publish_equipment_change(change: dict):
+    # Writes from other processes did not clear this process's cache
+    await response_cache.invalidate()
+    operation = change["operationType"]
+    if operation in ("insert", "update", "replace") and change.get("fullDocument"):
+        equipment = change["fullDocument"]
+        event_bus.publish("equipment", {
+            "action": "create" if operation == "insert" else "update",
+            "id": equipment["id"],
+            "equipment": equipment_event(equipment)
+        })
+    elif operation == "delete" and change.get("fullDocumentBeforeChange"):
+        event_bus.publish("equipment", {"action": "delete", "id": change["fullDocumentBeforeChange"]["id"]})
+    elif operation in ("delete", "drop", "invalidate"):
+        # Without pre-images the deleted id is unknown
+        event_bus.publish("equipment", {"action": "reload", "count": 1})
+
+async def publish_counters_change(change: dict):
+    # Change streams carry counter values, not deltas
+    counters = change.get("fullDocument")
+    if counters and counters.get("_id") == DASHBOARD_COUNTERS_ID:
+        await response_cache.invalidate()
+        event_bus.publish("dashboard", {"values": {
+            field: counters.get(group, 0) if group == "total" else counts_from_counters(counters.get(group, {}))
+            for group, field in DASHBOARD_COUNTER_FIELDS.items()
+        }})
+
+async def equipment_written(actor: str, delta: dict, saved: list = (), deleted: list = (), previous: list = ()):
+    # Every equipment write path ends here: counters move, the assets of the
+    # saved and previous (updated or deleted) records are rebuilt, daily
+    # rollups move, the changes are audited, the typeahead index follows,
+    # cached reads are dropped and, last, the changes are published: clients
+    # that re-read on an event must not get a page cached before the write
+    await apply_counter_deltas(delta)
+    await audit_writer.record(equipment_audit_entries(actor, saved, previous, deleted))
+    await apply_rollup_changes(db, saved, previous)
+    await refresh_assets(db, [equipment.get("serie") for equipment in [*saved, *previous]])
+    schedule_wakeup.set()
+    if SEARCH_INDEX_ENABLED:
+        apply_search_index_changes(search_index, saved, deleted)
+        if search_index_state["building"]:
+            search_index_state["pending"].append((list(saved), list(deleted)))
+    await response_cache.invalidate()
+    if not EVENTS_CHANGE_STREAM:
+        publish_equipment_events(delta, list(saved), list(deleted), list(previous))
+
+@api_router.post("/equipment", response_model=Equipment)
+async def create_equipment(equipment: EquipmentCreate, current_user: User = Depends(get_current_user)):
+    equipment_obj = build_new_equipment(equipment, current_user)
+    equipment_data = equipment_document(equipment_obj)
+    await db.equipment.insert_one(equipment_data)
     
-    equipment_obj = Equipment(**equipment_data)
-    await db.equipment.insert_one(equipment_obj.dict())
+    delta = {}
+    count_equipment(delta, equipment_data, 1)
+    await equipment_written(current_user.username, delta, saved=[equipment_data])
     return equipment_obj
 
-@api_router.get("/equipment", response_model=List[Equipment])
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_ERRORS = 1000
+
+def build_imported_equipment(row: dict, current_user: User) -> dict:
+    # Historical rows may carry their own date and technician
+    equipment = EquipmentCreate(**row)
+    equipment_data = equipment.dict()
+    equipment_data["fecha"] = row.get("fecha") or datetime.utcnow()
+    equipment_data["created_by"] = current_user.username
+    equipment_data["tecnico_responsable"] = row.get("tecnico_responsable") or current_user.full_name
+    imported = Equipment(**equipment_data)
+    # Dates parsed with an offset are stored as naive UTC like every other date
+    imported.fecha = as_utc(imported.fecha)
+    return equipment_document(stamp_new_equipment(imported))
+
+@api_router.post("/equipment/import")
+async def import_equipment(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    extension = Path(file.filename or "").suffix.lower().lstrip(".")
+    if extension not in IMPORT_READERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported file type. Use one of: {', '.join(IMPORT_READERS)}"
+        )
+    
+    rows = IMPORT_READERS[extension](file.file)
+    inserted = 0
+    failed = 0
+    errors = []
+    
+    def record_error(row_number, messages):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({"row": row_number, "errors": messages})
+    
+    while True:
+        try:
+            chunk = await run_in_threadpool(read_chunk, rows, IMPORT_BATCH_SIZE)
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Could not read file: {e}")
+        if not chunk:
+            break
+        
+        documents = []
+        row_numbers = []
+        for row_number, row in chunk:
+            try:
+                documents.append(build_imported_equipment(row, current_user))
+                row_numbers.append(row_number)
+            except ValidationError as e:
+                record_error(row_number, [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()])
+        
+        if not documents:
+            continue
+        rejected = set()
+        try:
+            result = await db.equipment.insert_many(documents, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details["nInserted"]
+            for write_error in e.details["writeErrors"]:
+                rejected.add(write_error["index"])
+                record_error(row_numbers[write_error["index"]], [write_error["errmsg"]])
+        
+        delta = {}
+        saved = [document for index, document in enumerate(documents) if index not in rejected]
+        for document in saved:
+            count_equipment(delta, document, 1)
+        await equipment_written(current_user.username, delta, saved=saved)
+    
+    return {"inserted": inserted, "failed": failed, "errors": errors}
+
+async def load_equipment_list(plan: QueryPlan, cursor: Optional[str], skip: int, limit: int,
+                              include_total: bool = False, include_facets: bool = False,
+                              projection: Dict[str, int] = EQUIPMENT_PROJECTION) -> bytes:
+    # Rows come straight from Mongo without _id and are encoded once; the
+    # encoded body is what the response cache keeps
+    total = counts = None
+    if include_total or include_facets:
+        equipment_list, next_cursor, total, counts = await find_equipment_page_with_counts(
+            plan, cursor, skip, limit, include_total, include_facets, projection
+        )
+    else:
+        equipment_list, next_cursor = await find_equipment_page(plan, cursor, skip, limit, projection)
+    if projection == EQUIPMENT_PROJECTION:
+        equipment_list = [{**EQUIPMENT_DEFAULTS, **equipment} for equipment in equipment_list]
+    if cursor is not None or include_total or include_facets:
+        return dumps({"items": equipment_list, "next_cursor": next_cursor, "total": total, "facets": counts})
+    return dumps(equipment_list)
+
+@api_router.get("/equipment", response_model=Union[EquipmentPage, List[Equipment], EquipmentFieldsPage, List[Dict[str, Any]]])
 async def get_equipment(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    view: str = "full",
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    equipment_list = await db.equipment.find().skip(skip).limit(limit).sort("created_at", -1).to_list(1000)
-    # Convert ObjectId to string and remove _id
-    cleaned_equipment = []
-    for equipment in equipment_list:
-        equipment_data = {k: (str(v) if isinstance(v, ObjectId) else v) for k, v in equipment.items()}
-        if "_id" in equipment_data:
-            del equipment_data["_id"]
-        cleaned_equipment.append(Equipment(**equipment_data))
-    return cleaned_equipment
-
-@api_router.post("/equipment/filter", response_model=List[Equipment])
+    # Sending a cursor (empty for the first page) opts into the paged response;
+    # view=summary or fields=a,b,c project the items down in Mongo
+    projection = equipment_projection(view, fields)
+    key = make_cache_key("get_equipment", skip=skip, limit=limit, cursor=cursor, projection=projection)
+    return EncodedJSONResponse(await response_cache.get_or_compute(
+        key, lambda: load_equipment_list(query_planner.plan({}), cursor, skip, limit, projection=projection)
+    ))
+
+@api_router.post("/equipment/filter", response_model=Union[EquipmentPage, List[Equipment], EquipmentFieldsPage, List[Dict[str, Any]]])
 async def filter_equipment(
     filters: EquipmentFilter,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    include_facets: bool = False,
+    view: str = "full",
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    query = {}
+    # include_total / include_facets return a page with counts for the whole
+    # filter, computed in the same aggregation as the page itself
+    plan = plan_equipment_query(filters)
+    projection = equipment_projection(view, fields)
+    key = make_cache_key(
+        "filter_equipment", filters=plan.key, skip=skip, limit=limit, cursor=cursor,
+        include_total=include_total, include_facets=include_facets, projection=projection
+    )
+    return EncodedJSONResponse(await response_cache.get_or_compute(
+        key, lambda: load_equipment_list(plan, cursor, skip, limit, include_total, include_facets, projection)
+    ))
+
+MAX_SEARCH_RESULTS = 100
+
+@api_router.post("/equipment/search", response_model=List[Equipment])
+async def search_equipment(
+    filters: EquipmentFilter,
+    skip: int = 0,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    # Relevance-ranked full-text search; the other filter fields narrow the match
+    if not filters.search:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A search term is required")
+    plan = plan_equipment_query(filters.copy(update={"search_mode": "text"}))
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
     
-    if filters.equipment_type:
-        query["equipment_type"] = filters.equipment_type
-    if filters.area:
-        query["area"] = {"$regex": filters.area, "$options": "i"}
-    if filters.tipo_mantenimiento:
-        query["tipo_mantenimiento"] = filters.tipo_mantenimiento
-    if filters.estado_equipo:
-        query["estado_equipo"] = filters.estado_equipo
-    if filters.fecha_inicio and filters.fecha_fin:
-        query["fecha"] = {"$gte": filters.fecha_inicio, "$lte": filters.fecha_fin}
-    if filters.search:
-        query["$or"] = [
-            {"marca": {"$regex": filters.search, "$options": "i"}},
-            {"modelo": {"$regex": filters.search, "$options": "i"}},
-            {"serie": {"$regex": filters.search, "$options": "i"}},
-            {"observaciones": {"$regex": filters.search, "$options": "i"}}
-        ]
+    async def load():
+        equipment_list = await db.equipment.find(
+            plan.query, {**EQUIPMENT_PROJECTION, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})] + EQUIPMENT_SORT).skip(skip).limit(limit).to_list(limit)
+        for equipment in equipment_list:
+            del equipment["score"]
+        return dumps([{**EQUIPMENT_DEFAULTS, **equipment} for equipment in equipment_list])
+    
+    key = make_cache_key("search_equipment", filters=plan.key, skip=skip, limit=limit)
+    return EncodedJSONResponse(await response_cache.get_or_compute(key, load))
+
+@api_router.get("/equipment/suggest")
+async def suggest_equipment(
+    q: str,
+    limit: int = 10,
+    current_user: User = Depends(get_current_user)
+):
+    limit = max(1, min(limit, 50))
+    if search_index_state["ready"]:
+        return search_index.suggest(q, limit)
     
-    equipment_list = await db.equipment.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(1000)
-    # Convert ObjectId to string and remove _id
-    cleaned_equipment = []
-    for equipment in equipment_list:
-        equipment_data = {k: (str(v) if isinstance(v, ObjectId) else v) for k, v in equipment.items()}
-        if "_id" in equipment_data:
-            del equipment_data["_id"]
-        cleaned_equipment.append(Equipment(**equipment_data))
-    return cleaned_equipment
+    # Index disabled or still building: fall back to the indexed prefix fields
+    normalized = q.strip().lower()
+    if not normalized:
+        return []
+    prefix = {"$regex": f"^{re.escape(normalized)}"}
+    projection = {"_id": 0, **{field: 1 for field in SUMMARY_FIELDS}}
+    query = {"$or": [{"serie_lower": prefix}, {"nombre_pc_lower": prefix}]}
+    return await db.equipment.find(query, projection).limit(limit).to_list(limit)
+
+# Declared after the fixed /equipment/... paths so they are not taken for ids
+@api_router.get("/equipment/{equipment_id}", response_model=Equipment)
+async def get_equipment_by_id(
+    equipment_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    equipment = await db.equipment.find_one({"id": equipment_id}, {"_id": 0})
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    return Equipment(**equipment)
 
 @api_router.put("/equipment/{equipment_id}", response_model=Equipment)
 async def update_equipment(
@@ -455,151 +1278,853 @@ async def update_equipment(
     equipment_update: EquipmentUpdate,
     current_user: User = Depends(get_admin_user)
 ):
-    equipment = await db.equipment.find_one({"id": equipment_id})
-    if not equipment:
+    changes = build_equipment_changes(equipment_update, current_user)
+    # The previous version feeds the counters; the new one is the $set applied to it
+    previous_equipment = await db.equipment.find_one_and_update(
+        {"id": equipment_id},
+        {"$set": changes},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not previous_equipment:
         raise HTTPException(status_code=404, detail="Equipment not found")
+    updated_equipment = {**previous_equipment, **changes}
+    # Repair transitions are only known once the previous state is back; the
+    # stamps go to this version only, not to a newer concurrent update
+    stamps = repair_stamps(previous_equipment.get("estado_equipo"), updated_equipment["estado_equipo"], changes["updated_at"])
+    if stamps:
+        await db.equipment.update_one({"id": equipment_id, "updated_at": changes["updated_at"]}, {"$set": stamps})
+        updated_equipment.update(stamps)
     
-    update_data = {k: v for k, v in equipment_update.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow()
-    update_data["updated_by"] = current_user.username
-    
-    await db.equipment.update_one({"id": equipment_id}, {"$set": update_data})
-    
-    updated_equipment = await db.equipment.find_one({"id": equipment_id})
-    # Convert ObjectId to string and remove _id
-    equipment_data = {k: (str(v) if isinstance(v, ObjectId) else v) for k, v in updated_equipment.items()}
-    if "_id" in equipment_data:
-        del equipment_data["_id"]
-    return Equipment(**equipment_data)
+    delta = {}
+    count_equipment_change(delta, previous_equipment, updated_equipment)
+    await equipment_written(current_user.username, delta, saved=[updated_equipment], previous=[previous_equipment])
+    return Equipment(**updated_equipment)
 
 @api_router.delete("/equipment/{equipment_id}")
 async def delete_equipment(
     equipment_id: str,
     current_user: User = Depends(get_admin_user)
 ):
-    result = await db.equipment.delete_one({"id": equipment_id})
-    if result.deleted_count == 0:
+    deleted_equipment = await db.equipment.find_one_and_delete({"id": equipment_id}, projection={"_id": 0})
+    if not deleted_equipment:
         raise HTTPException(status_code=404, detail="Equipment not found")
+    
+    delta = {}
+    count_equipment(delta, deleted_equipment, -1)
+    await equipment_written(current_user.username, delta, deleted=[equipment_id], previous=[deleted_equipment])
     return {"message": "Equipment deleted successfully"}
 
-@api_router.get("/dashboard", response_model=DashboardStats)
-async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    # Total equipments
-    total_equipments = await db.equipment.count_documents({})
+MAX_BATCH_SIZE = 1000
+
+@api_router.post("/equipment/batch", response_model=EquipmentBatchResult)
+async def batch_equipment(batch: EquipmentBatch, current_user: User = Depends(get_current_user)):
+    if len(batch.create) + len(batch.update) + len(batch.delete) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may contain at most {MAX_BATCH_SIZE} operations"
+        )
+    # Updates and deletes keep the same permissions as the single-item endpoints
+    if (batch.update or batch.delete) and current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    target_ids = [item.id for item in batch.update] + batch.delete
+    if len(set(target_ids)) != len(target_ids):
+        # Unordered bulk writes give no ordering guarantee between operations on the same id
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each equipment id may appear only once per batch"
+        )
     
-    # Equipment by type
-    pipeline_type = [
-        {"$group": {"_id": "$equipment_type", "count": {"$sum": 1}}}
-    ]
-    type_results = await db.equipment.aggregate(pipeline_type).to_list(100)
-    equipments_by_type = {item["_id"]: item["count"] for item in type_results}
+    existing_equipment = {}
+    if target_ids:
+        # Whole records: they are the previous versions the audit log diffs against
+        existing = db.equipment.find({"id": {"$in": target_ids}}, {"_id": 0})
+        existing_equipment = {equipment["id"]: equipment async for equipment in existing}
     
-    # Equipment by status
-    pipeline_status = [
-        {"$group": {"_id": "$estado_equipo", "count": {"$sum": 1}}}
-    ]
-    status_results = await db.equipment.aggregate(pipeline_status).to_list(100)
-    equipments_by_status = {item["_id"]: item["count"] for item in status_results}
+    results = []
+    operations = []
+    # Counter changes per operation, applied only for operations that succeed
+    deltas = []
+    for index, equipment in enumerate(batch.create):
+        equipment_obj = build_new_equipment(equipment, current_user)
+        equipment_data = equipment_document(equipment_obj)
+        operations.append(InsertOne(equipment_data))
+        delta = {}
+        count_equipment(delta, equipment_data, 1)
+        deltas.append(delta)
+        results.append(EquipmentBatchItemResult(
+            operation="create", index=index, id=equipment_obj.id, status="ok", equipment=equipment_obj
+        ))
+    for index, item in enumerate(batch.update):
+        result = EquipmentBatchItemResult(operation="update", index=index, id=item.id, status="ok")
+        if item.id in existing_equipment:
+            changes = build_equipment_changes(item.changes, current_user)
+            changes.update(repair_stamps(
+                existing_equipment[item.id].get("estado_equipo"),
+                changes.get("estado_equipo", existing_equipment[item.id].get("estado_equipo")),
+                changes["updated_at"]
+            ))
+            operations.append(UpdateOne({"id": item.id}, {"$set": changes}))
+            delta = {}
+            count_equipment_change(delta, existing_equipment[item.id], {**existing_equipment[item.id], **changes})
+            deltas.append(delta)
+        else:
+            result.status = "not_found"
+        results.append(result)
+    for index, equipment_id in enumerate(batch.delete):
+        result = EquipmentBatchItemResult(operation="delete", index=index, id=equipment_id, status="ok")
+        if equipment_id in existing_equipment:
+            operations.append(DeleteOne({"id": equipment_id}))
+            delta = {}
+            count_equipment(delta, existing_equipment[equipment_id], -1)
+            deltas.append(delta)
+        else:
+            result.status = "not_found"
+        results.append(result)
     
-    # Maintenance by type
-    pipeline_maintenance = [
-        {"$group": {"_id": "$tipo_mantenimiento", "count": {"$sum": 1}}}
-    ]
-    maintenance_results = await db.equipment.aggregate(pipeline_maintenance).to_list(100)
-    maintenance_by_type = {item["_id"]: item["count"] for item in maintenance_results}
+    failed_operations = set()
+    if operations:
+        # Operations, deltas and "ok" results were appended in the same order
+        pending = [result for result in results if result.status == "ok"]
+        try:
+            await db.equipment.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details["writeErrors"]:
+                failed_operations.add(write_error["index"])
+                failed = pending[write_error["index"]]
+                failed.status = "error"
+                failed.error = write_error["errmsg"]
+                failed.equipment = None
+        
+    updated_ids = [result.id for result in results if result.operation == "update" and result.status == "ok"]
+    updated_equipment = {}
+    if updated_ids:
+        updated = db.equipment.find({"id": {"$in": updated_ids}}, {"_id": 0})
+        updated_equipment = {equipment["id"]: equipment async for equipment in updated}
+        for result in results:
+            if result.operation == "update" and result.status == "ok" and result.id in updated_equipment:
+                result.equipment = Equipment(**updated_equipment[result.id])
     
-    # Recent maintenances
-    recent_maintenances = await db.equipment.find().sort("created_at", -1).limit(5).to_list(5)
-    recent_maintenances = [
-        {
-            "id": item["id"],
-            "equipment_type": item["equipment_type"],
-            "marca": item["marca"],
-            "modelo": item["modelo"],
-            "tipo_mantenimiento": item["tipo_mantenimiento"],
-            "fecha": item["fecha"],
-            "tecnico_responsable": item["tecnico_responsable"]
+    if operations:
+        total_delta = {}
+        for index, delta in enumerate(deltas):
+            if index not in failed_operations:
+                for key, value in delta.items():
+                    total_delta[key] = total_delta.get(key, 0) + value
+        saved = [
+            equipment_document(result.equipment) if result.operation == "create" else updated_equipment[result.id]
+            for result in results
+            if result.status == "ok" and result.operation in ("create", "update") and result.equipment
+        ]
+        deleted = [result.id for result in results if result.operation == "delete" and result.status == "ok"]
+        previous = [
+            existing_equipment[result.id] for result in results
+            if result.operation in ("update", "delete") and result.status == "ok"
+        ]
+        await equipment_written(current_user.username, total_delta, saved=saved, deleted=deleted, previous=previous)
+    
+    return EquipmentBatchResult(results=results)
+
+def counts_by_key(results: List[dict]) -> Dict[str, int]:
+    return {item["_id"]: item["count"] for item in results}
+
+DASHBOARD_COUNT_FACETS = {
+    "total": [{"$count": "count"}],
+    "by_type": [{"$group": {"_id": "$equipment_type", "count": {"$sum": 1}}}],
+    "by_status": [{"$group": {"_id": "$estado_equipo", "count": {"$sum": 1}}}],
+    "by_maintenance": [{"$group": {"_id": "$tipo_mantenimiento", "count": {"$sum": 1}}}],
+}
+
+DASHBOARD_RECENT_PIPELINE = [
+    {"$sort": dict(EQUIPMENT_SORT)},
+    {"$limit": 5},
+    {"$project": {
+        "_id": 0,
+        "id": 1,
+        "equipment_type": 1,
+        "marca": 1,
+        "modelo": 1,
+        "tipo_mantenimiento": 1,
+        "fecha": 1,
+        "tecnico_responsable": 1
+    }}
+]
+
+DASHBOARD_RECONCILE_ATTEMPTS = 5
+
+async def rebuild_dashboard_counters() -> dict:
+    # Reconciliation: recount from the source collection and replace the
+    # document, unless a write moved the counters during the recount; the
+    # recount is then repeated so the write's $inc is not lost
+    for _ in range(DASHBOARD_RECONCILE_ATTEMPTS):
+        current = await db.dashboard_counters.find_one({"_id": DASHBOARD_COUNTERS_ID}, {"version": 1})
+        version = current.get("version") if current else None
+        stats = (await db.equipment.aggregate([{"$facet": DASHBOARD_COUNT_FACETS}]).to_list(1))[0]
+        counters = {
+            "_id": DASHBOARD_COUNTERS_ID,
+            "total": stats["total"][0]["count"] if stats["total"] else 0,
+            "version": (version or 0) + 1,
         }
-        for item in recent_maintenances
+        for group in COUNTED_FIELDS:
+            counters[group] = {counter_key(item["_id"]): item["count"] for item in stats[group]}
+        unchanged = {"version": version} if version is not None else {"version": {"$exists": False}}
+        try:
+            result = await db.dashboard_counters.replace_one(
+                {"_id": DASHBOARD_COUNTERS_ID, **unchanged}, counters, upsert=current is None
+            )
+        except DuplicateKeyError:
+            # Created by a write since it was read
+            continue
+        if current is None or result.matched_count:
+            return counters
+    logging.warning("Dashboard counters kept changing during reconciliation; left as they are")
+    return await db.dashboard_counters.find_one({"_id": DASHBOARD_COUNTERS_ID})
+
+def counts_from_counters(counters: dict) -> Dict[str, int]:
+    return {counter_value_name(key): count for key, count in counters.items() if count}
+
+async def compute_dashboard_stats(query: dict) -> DashboardStats:
+    if not query:
+        counters, recent_maintenances = await asyncio.gather(
+            db.dashboard_counters.find_one({"_id": DASHBOARD_COUNTERS_ID}),
+            db.equipment.aggregate(DASHBOARD_RECENT_PIPELINE).to_list(5)
+        )
+        counters = counters or await rebuild_dashboard_counters()
+        return DashboardStats(
+            total_equipments=counters.get("total", 0),
+            equipments_by_type=counts_from_counters(counters.get("by_type", {})),
+            equipments_by_status=counts_from_counters(counters.get("by_status", {})),
+            maintenance_by_type=counts_from_counters(counters.get("by_maintenance", {})),
+            recent_maintenances=recent_maintenances
+        )
+    
+    # Scoped dashboards: one aggregation, the filter runs once and each statistic is a facet
+    pipeline = [
+        {"$match": query},
+        {"$facet": {**DASHBOARD_COUNT_FACETS, "recent": DASHBOARD_RECENT_PIPELINE}}
     ]
+    stats = (await db.equipment.aggregate(pipeline).to_list(1))[0]
     
     return DashboardStats(
-        total_equipments=total_equipments,
-        equipments_by_type=equipments_by_type,
-        equipments_by_status=equipments_by_status,
-        maintenance_by_type=maintenance_by_type,
-        recent_maintenances=recent_maintenances
+        total_equipments=stats["total"][0]["count"] if stats["total"] else 0,
+        equipments_by_type=counts_by_key(stats["by_type"]),
+        equipments_by_status=counts_by_key(stats["by_status"]),
+        maintenance_by_type=counts_by_key(stats["by_maintenance"]),
+        recent_maintenances=stats["recent"]
+    )
+
+@api_router.get("/dashboard", response_model=DashboardStats)
+async def get_dashboard_stats(
+    filters: EquipmentFilter = Depends(),
+    current_user: User = Depends(get_current_user)
+):
+    plan = plan_equipment_query(filters)
+    key = make_cache_key("get_dashboard_stats", filters=plan.key)
+    return await response_cache.get_or_compute(key, lambda: compute_dashboard_stats(plan.query))
+
+@api_router.post("/admin/dashboard/reconcile", response_model=DashboardStats)
+async def reconcile_dashboard_counters(current_user: User = Depends(get_admin_user)):
+    await rebuild_dashboard_counters()
+    await response_cache.invalidate()
+    return await compute_dashboard_stats({})
+
+def as_utc(value: datetime) -> datetime:
+    # Stored dates are naive UTC; aware inputs are converted, naive ones taken as UTC
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def resolve_date_range(start: Optional[datetime], end: Optional[datetime]):
+    # Defaults to the last 12 months; end is inclusive for callers, so the
+    # whole end day is counted
+    default_start, default_end = default_range()
+    start = as_utc(start) if start else default_start
+    end = day_of(as_utc(end)) + timedelta(days=1) if end else default_end
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+# Trend charts read the daily rollups: one document per day and grouped value
+MAX_TIMESERIES_PERIODS = int(os.environ.get('MAX_TIMESERIES_PERIODS', '1000'))
+
+@api_router.get("/analytics/timeseries", response_model=Timeseries)
+async def get_timeseries(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: str = "month",
+    group_by: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"Unsupported interval. Use one of: {', '.join(INTERVALS)}")
+    if group_by and group_by not in ROLLUP_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported group_by. Use one of: {', '.join(ROLLUP_DIMENSIONS)}")
+    start, end = resolve_date_range(start, end)
+    if (end - start).days / {"day": 1, "week": 7, "month": 28}[interval] > MAX_TIMESERIES_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Range too large; at most {MAX_TIMESERIES_PERIODS} periods")
+
+    dimension = group_by or TOTAL_DIMENSION
+    async def load():
+        periods, series = await load_timeseries(db, dimension, start, end, interval)
+        return Timeseries(
+            interval=interval,
+            group_by=dimension,
+            start=start,
+            end=end,
+            periods=periods,
+            series=sorted(
+                (
+                    TimeseriesSeries(value=value, total=sum(points.values()), points=list(points.values()))
+                    for value, points in series.items()
+                ),
+                key=lambda item: -item.total
+            )
+        )
+
+    key = make_cache_key("get_timeseries", start=start, end=end, interval=interval, group_by=dimension)
+    return await response_cache.get_or_compute(key, load)
+
+@api_router.post("/admin/analytics/backfill")
+async def backfill_rollups(current_user: User = Depends(get_admin_user)):
+    buckets = await rebuild_rollups(db)
+    await response_cache.invalidate()
+    return {"message": "Rollups rebuilt successfully", "buckets": buckets}
+
+# Workload and time-to-repair per technician, aggregated server-side
+async def technician_report(start: datetime, end: datetime) -> TechnicianReport:
+    async def load():
+        workload, repairs, open_repairs = await asyncio.gather(
+            db.equipment.aggregate(workload_pipeline(start, end)).to_list(None),
+            db.equipment.aggregate(repair_pipeline(start, end)).to_list(None),
+            db.equipment.aggregate(open_repairs_pipeline()).to_list(None)
+        )
+        return TechnicianReport(start=start, end=end, **merge_report(workload, repairs, open_repairs))
+
+    key = make_cache_key("technician_report", start=start, end=end)
+    return await response_cache.get_or_compute(key, load)
+
+@api_router.get("/reports/technicians", response_model=TechnicianReport)
+async def get_technician_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    return await technician_report(*resolve_date_range(start, end))
+
+@api_router.get("/reports/technicians/export")
+async def export_technician_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = "xlsx",
+    current_user: User = Depends(get_current_user)
+):
+    if format not in REPORT_WRITERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(REPORT_WRITERS)}")
+    report = await technician_report(*resolve_date_range(start, end))
+    content = REPORT_WRITERS[format]([technician.dict() for technician in report.technicians])
+    filename = f"reporte_tecnicos_{report.start:%Y%m%d}_{report.end:%Y%m%d}.{format}"
+    return Response(
+        content=content,
+        media_type=REPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
+# Per-asset reads: the asset document holds the latest state, the timeline is
+# the asset's events read through the (serie, fecha, created_at) index
+MAX_TIMELINE_SIZE = 500
+MAX_DUE_ASSETS = 1000
+
+# Declared before /assets/{serie} so "due" is not taken for a serie
+@api_router.get("/assets/due", response_model=DueAssets)
+async def get_due_assets(
+    days: int = 30,
+    equipment_type: Optional[str] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user)
+):
+    # Both lists are ranges on the next_due index, soonest first
+    limit = max(1, min(limit, MAX_DUE_ASSETS))
+    now = datetime.utcnow()
+    scope = {"equipment_type": equipment_type} if equipment_type else {}
+    overdue, upcoming = await asyncio.gather(
+        db.assets.find({**scope, "next_due": {"$lt": now}}, {"_id": 0}).sort("next_due", ASCENDING).limit(limit).to_list(limit),
+        db.assets.find(
+            {**scope, "next_due": {"$gte": now, "$lt": now + timedelta(days=max(days, 0))}}, {"_id": 0}
+        ).sort("next_due", ASCENDING).limit(limit).to_list(limit)
+    )
+    return DueAssets(
+        as_of=now,
+        overdue=[Asset(**asset) for asset in overdue],
+        upcoming=[Asset(**asset) for asset in upcoming]
+    )
+
+@api_router.get("/assets/{serie}", response_model=Asset)
+async def get_asset(serie: str, current_user: User = Depends(get_current_user)):
+    asset = await db.assets.find_one({"serie": serie}, {"_id": 0})
+    if not asset:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return Asset(**asset)
+
+@api_router.get("/assets/{serie}/timeline", response_model=List[Equipment])
+async def get_asset_timeline(
+    serie: str,
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user)
+):
+    limit = max(1, min(limit, MAX_TIMELINE_SIZE))
+    events = await db.equipment.find({"serie": serie}, EQUIPMENT_PROJECTION).sort(
+        ASSET_EVENT_SORT
+    ).skip(skip).limit(limit).to_list(limit)
+    if not events and not skip:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return EncodedJSONResponse(dumps([{**EQUIPMENT_DEFAULTS, **event} for event in events]))
+
+@api_router.post("/admin/assets/migrate")
+async def run_asset_migration(current_user: User = Depends(get_admin_user)):
+    migrated = await migrate_assets(db)
+    schedule_wakeup.set()
+    return {"message": "Assets migrated successfully", "assets": migrated}
+
+@api_router.get("/admin/search-index")
+async def get_search_index_stats(current_user: User = Depends(get_admin_user)):
+    return {
+        "enabled": SEARCH_INDEX_ENABLED,
+        "ready": search_index_state["ready"],
+        "built_at": search_index_state["built_at"],
+        **search_index.stats()
+    }
+
+MAX_AUDIT_PAGE_SIZE = 500
+
+@api_router.get("/admin/audit", response_model=AuditPage)
+async def get_audit_log(
+    entity: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    actor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_admin_user)
+):
+    # Entity history, actor history and time windows each read an index
+    # ending in (at, id), so pages come straight off the index
+    limit = max(1, min(limit, MAX_AUDIT_PAGE_SIZE))
+    query = {}
+    if entity:
+        query["entity"] = entity
+    if entity_id:
+        query["entity_id"] = entity_id
+    if actor:
+        query["actor"] = actor
+    if start or end:
+        query["at"] = {}
+        if start:
+            query["at"]["$gte"] = as_utc(start)
+        if end:
+            query["at"]["$lte"] = as_utc(end)
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor, "at")]}
+    entries = await db.audit_log.find(query, {"_id": 0}).sort(AUDIT_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(entries[limit - 1], "at") if len(entries) > limit else None
+    return AuditPage(items=[AuditEntry(**entry) for entry in entries[:limit]], next_cursor=next_cursor)
+
+@api_router.get("/admin/audit/writer")
+async def get_audit_writer_stats(current_user: User = Depends(get_admin_user)):
+    return audit_writer.stats()
+
+def hash_event_ticket(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+@api_router.post("/events/ticket")
+async def create_event_ticket(current_user: User = Depends(get_current_user)):
+    ticket = secrets.token_urlsafe(32)
+    await db.event_tickets.insert_one({
+        "ticket_hash": hash_event_ticket(ticket),
+        "username": current_user.username,
+        "expires_at": datetime.utcnow() + timedelta(seconds=EVENTS_TICKET_SECONDS)
+    })
+    return {"ticket": ticket, "expires_in": EVENTS_TICKET_SECONDS}
+
+async def user_still_active(username: str) -> bool:
+    user = await user_cache.get_or_compute(username, lambda: load_user(username))
+    return user is not None and user.is_active
+
+async def redeem_event_ticket(ticket: str) -> User:
+    invalid_ticket_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid event ticket")
+    # Deleting the ticket as it is read makes it single-use
+    stored_ticket = await db.event_tickets.find_one_and_delete(
+        {"ticket_hash": hash_event_ticket(ticket), "expires_at": {"$gt": datetime.utcnow()}}
+    )
+    if not stored_ticket:
+        raise invalid_ticket_exception
+    if not await user_still_active(stored_ticket["username"]):
+        raise invalid_ticket_exception
+    return await user_cache.get_or_compute(stored_ticket["username"], lambda: load_user(stored_ticket["username"]))
+
+@api_router.get("/events")
+async def stream_change_events(
+    request: Request,
+    ticket: Optional[str] = None,
+    last_event_id: Optional[str] = None
+):
+    # Clients that can send headers use the access token; EventSource uses a
+    # ticket from POST /events/ticket. Browsers resend Last-Event-ID when they
+    # reconnect.
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        user = await user_from_token(authorization[len("Bearer "):])
+    elif ticket:
+        user = await redeem_event_ticket(ticket)
+    else:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    subscriber, initial = event_bus.subscribe(request.headers.get("Last-Event-ID") or last_event_id)
+    return StreamingResponse(
+        # The account is checked again every heartbeat, so a deactivated or
+        # deleted user's stream ends
+        stream_events(
+            event_bus, subscriber, initial, EVENTS_HEARTBEAT_SECONDS,
+            authorize=lambda: user_still_active(user.username)
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/admin/events")
+async def get_event_stats(current_user: User = Depends(get_admin_user)):
+    return {"change_stream": EVENTS_CHANGE_STREAM, **event_bus.stats()}
+
+@api_router.get("/admin/cache")
+async def get_cache_stats(current_user: User = Depends(get_admin_user)):
+    return {**response_cache.stats(), "query_plans": query_planner.stats()}
+
+# Exports read the cursor in batches and hand each batch to a writer on a
+# worker thread, so neither the result set nor the serialization sits on the loop
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def export_cursor(plan: QueryPlan):
+    cursor = db.equipment.find(plan.query, {"_id": 0}).sort(plan.sort).batch_size(EXPORT_BATCH_SIZE)
+    return cursor.hint(plan.hint) if plan.hint else cursor
+
+async def write_export(writer_class, plan: QueryPlan) -> str:
+    fd, path = tempfile.mkstemp(suffix=f".{writer_class.extension}")
+    os.close(fd)
+    try:
+        writer = await run_in_threadpool(writer_class, path)
+        batch = []
+        async for equipment in export_cursor(plan):
+            batch.append(equipment)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                await run_in_threadpool(writer.write_rows, batch)
+                batch = []
+        if batch:
+            await run_in_threadpool(writer.write_rows, batch)
+        await run_in_threadpool(writer.close)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+def read_export_file(export_file):
+    with export_file:
+        while chunk := export_file.read(EXPORT_CHUNK_SIZE):
+            yield chunk
+
+def stream_export_file(path: str):
+    # The file is unlinked as soon as it is open, so nothing is left on disk
+    # even if the client goes away before the body starts
+    export_file = open(path, "rb")
+    os.remove(path)
+    return read_export_file(export_file)
+
+async def stream_csv_export(plan: QueryPlan):
+    # CSV needs no trailing index, so rows go out as each batch arrives
+    yield csv_chunk([], include_header=True)
+    batch = []
+    async for equipment in export_cursor(plan):
+        batch.append(equipment)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield csv_chunk(batch)
+            batch = []
+    if batch:
+        yield csv_chunk(batch)
+
+def get_export_writer(export_format: str):
+    writer_class = EXPORT_WRITERS.get(export_format)
+    if writer_class is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format. Use one of: {', '.join(EXPORT_WRITERS)}"
+        )
+    if not writer_class.available:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"Export format {export_format} is not available on this server"
+        )
+    return writer_class
+
+@api_router.post("/export")
+async def export_equipment(
+    filters: EquipmentFilter,
+    export_format: str = Query("xlsx", alias="format"),
+    current_user: User = Depends(get_current_user)
+):
+    writer_class = get_export_writer(export_format)
+    plan = plan_equipment_query(filters)
+    headers = {"Content-Disposition": f"attachment; filename=reporte_mantenimiento.{writer_class.extension}"}
+    
+    if export_format == "csv":
+        stream = stream_csv_export(plan)
+    else:
+        stream = stream_export_file(await write_export(writer_class, plan))
+    return StreamingResponse(stream, media_type=writer_class.media_type, headers=headers)
+
 @api_router.post("/export/excel")
 async def export_to_excel(
     filters: EquipmentFilter,
     current_user: User = Depends(get_current_user)
 ):
-    query = {}
+    return await export_equipment(filters, "xlsx", current_user)
+
+def export_filter_key(plan: QueryPlan, export_format: str) -> str:
+    return hashlib.sha256(f"{export_format}:{plan.key}".encode()).hexdigest()
+
+async def run_export_in_pool(job_id: str, plan: QueryPlan, export_format: str, path: str):
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(
+            export_pool, run_export_job,
+            mongo_url, db.name, job_id, plan.query, plan.sort, export_format, path, EXPORT_BATCH_SIZE
+        )
+    except Exception as e:
+        logging.exception(f"Export job {job_id} failed")
+        await db.export_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}}
+        )
+        if os.path.exists(path):
+            os.remove(path)
+
+async def purge_expired_exports(fresh_since: datetime):
+    await db.export_jobs.update_many(
+        {"status": "completed", "finished_at": {"$lt": fresh_since}},
+        {"$set": {"status": "expired"}}
+    )
+    # Artifacts are only written when a job finishes, so mtime marks completion
+    if EXPORT_DIR.exists():
+        for artifact in EXPORT_DIR.iterdir():
+            if datetime.utcfromtimestamp(artifact.stat().st_mtime) < fresh_since:
+                artifact.unlink(missing_ok=True)
+
+@api_router.post("/export/jobs", response_model=ExportJob)
+async def create_export_job(
+    filters: EquipmentFilter,
+    export_format: str = Query("xlsx", alias="format"),
+    current_user: User = Depends(get_current_user)
+):
+    get_export_writer(export_format)
+    plan = plan_equipment_query(filters)
+    filter_key = export_filter_key(plan, export_format)
+    fresh_since = datetime.utcnow() - timedelta(minutes=EXPORT_CACHE_MINUTES)
+    await purge_expired_exports(fresh_since)
     
-    if filters.equipment_type:
-        query["equipment_type"] = filters.equipment_type
-    if filters.area:
-        query["area"] = {"$regex": filters.area, "$options": "i"}
-    if filters.tipo_mantenimiento:
-        query["tipo_mantenimiento"] = filters.tipo_mantenimiento
-    if filters.estado_equipo:
-        query["estado_equipo"] = filters.estado_equipo
-    if filters.fecha_inicio and filters.fecha_fin:
-        query["fecha"] = {"$gte": filters.fecha_inicio, "$lte": filters.fecha_fin}
-    if filters.search:
-        query["$or"] = [
-            {"marca": {"$regex": filters.search, "$options": "i"}},
-            {"modelo": {"$regex": filters.search, "$options": "i"}},
-            {"serie": {"$regex": filters.search, "$options": "i"}},
-            {"observaciones": {"$regex": filters.search, "$options": "i"}}
-        ]
+    # Reuse a recent artifact, or a job still in flight, for the same filter
+    existing_job = await db.export_jobs.find_one(
+        {
+            "filter_key": filter_key,
+            "$or": [
+                {"status": {"$in": ["pending", "running"]}, "created_at": {"$gte": fresh_since}},
+                {"status": "completed", "finished_at": {"$gte": fresh_since}}
+            ]
+        },
+        sort=[("created_at", DESCENDING)]
+    )
+    if existing_job and (existing_job["status"] != "completed" or os.path.exists(existing_job["path"])):
+        return ExportJob(**existing_job)
     
-    equipment_list = await db.equipment.find(query).sort("created_at", -1).to_list(10000)
-    
-    # Convert to DataFrame
-    df_data = []
-    for equipment in equipment_list:
-        df_data.append({
-            "ID": equipment["id"],
-            "Área": equipment["area"],
-            "Tipo de Equipo": equipment["equipment_type"],
-            "Nombre PC": equipment.get("nombre_pc", ""),
-            "Marca": equipment["marca"],
-            "Modelo": equipment["modelo"],
-            "Serie": equipment["serie"],
-            "Fecha Mantenimiento": equipment["fecha"].strftime("%Y-%m-%d"),
-            "Tipo Mantenimiento": equipment["tipo_mantenimiento"],
-            "Estado Equipo": equipment["estado_equipo"],
-            "Observaciones": equipment["observaciones"],
-            "Técnico Responsable": equipment["tecnico_responsable"],
-            "Creado por": equipment["created_by"],
-            "Fecha Creación": equipment["created_at"].strftime("%Y-%m-%d %H:%M:%S")
-        })
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    job_id = str(uuid.uuid4())
+    job = {
+        "id": job_id,
+        "status": "pending",
+        "format": export_format,
+        "filters": json.loads(filters.json(exclude_none=True)),
+        "filter_key": filter_key,
+        "path": str(EXPORT_DIR / f"{job_id}.{export_format}"),
+        "processed": 0,
+        "created_by": current_user.username,
+        "created_at": datetime.utcnow()
+    }
+    await db.export_jobs.insert_one(job)
     
-    df = pd.DataFrame(df_data)
+    task = asyncio.create_task(run_export_in_pool(job_id, plan, export_format, job["path"]))
+    export_tasks.add(task)
+    task.add_done_callback(export_tasks.discard)
+    return ExportJob(**job)
+
+@api_router.get("/export/jobs/{job_id}", response_model=ExportJob)
+async def get_export_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await db.export_jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return ExportJob(**job)
+
+@api_router.get("/export/jobs/{job_id}/download")
+async def download_export_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await db.export_jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["status"] != "completed" or not os.path.exists(job["path"]):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export job is not downloadable (status: {job['status']})"
+        )
     
-    # Create Excel file in memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Mantenimiento Equipos', index=False)
+    return FileResponse(
+        job["path"],
+        media_type=EXPORT_WRITERS[job["format"]].media_type,
+        filename=f"reporte_mantenimiento.{job['format']}"
+    )
+
+# Representative query per endpoint, explained by the index report
+ENDPOINT_QUERIES = {
+    "get_current_user": ("users", {"username": "admin"}, None),
+    "update_user_by_admin": ("users", {"id": ""}, None),
+    "get_equipment": ("equipment", {}, EQUIPMENT_SORT),
+    "filter_equipment": (
+        "equipment",
+        {"equipment_type": "cpu", "estado_equipo": "operativo", "tipo_mantenimiento": "preventivo"},
+        EQUIPMENT_SORT
+    ),
+    "filter_equipment_prefix_search": ("equipment", {"serie_lower": {"$regex": "^abc"}}, EQUIPMENT_SORT),
+    "update_equipment": ("equipment", {"id": ""}, None),
+    "delete_equipment": ("equipment", {"id": ""}, None),
+    "export_to_excel": ("equipment", {"fecha": {"$gte": datetime(2000, 1, 1)}}, EQUIPMENT_SORT),
+    "get_asset": ("assets", {"serie": ""}, None),
+    "get_asset_timeline": ("equipment", {"serie": ""}, ASSET_EVENT_SORT),
+    "get_due_assets": ("assets", {"next_due": {"$lt": datetime(2000, 1, 1)}}, [("next_due", ASCENDING)]),
+    "get_technician_report": ("equipment", {"fecha": {"$gte": datetime(2000, 1, 1)}}, None),
+    "get_technician_report_repairs": ("equipment", {"repaired_at": {"$type": "date", "$gte": datetime(2000, 1, 1)}}, None),
+    "get_audit_log": ("audit_log", {"entity": "equipment", "entity_id": ""}, AUDIT_SORT),
+    "get_timeseries": ("daily_rollups", {"dimension": "total", "day": {"$gte": datetime(2000, 1, 1)}}, None),
+}
+
+def plan_indexes(explain: dict) -> List[str]:
+    # Collect the index names (or COLLSCAN) used by the winning plan
+    winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    stages = [winning_plan.get("queryPlan", winning_plan)]
+    used = []
+    while stages:
+        stage = stages.pop()
+        if stage.get("stage") == "IXSCAN":
+            used.append(stage.get("indexName"))
+        elif stage.get("stage") == "COLLSCAN":
+            used.append("COLLSCAN")
+        if "inputStage" in stage:
+            stages.append(stage["inputStage"])
+        stages.extend(stage.get("inputStages", []))
+    return used
+
+@api_router.get("/admin/indexes")
+async def get_index_report(current_user: User = Depends(get_admin_user)):
+    declared = {
+        "equipment": list((await db.equipment.index_information()).keys()),
+        "users": list((await db.users.index_information()).keys()),
+        "assets": list((await db.assets.index_information()).keys()),
+        "daily_rollups": list((await db.daily_rollups.index_information()).keys()),
+        "audit_log": list((await db.audit_log.index_information()).keys()),
+    }
     
-    output.seek(0)
+    endpoints = {}
+    for endpoint, (collection_name, query, sort) in ENDPOINT_QUERIES.items():
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.limit(1).explain()
+        endpoints[endpoint] = {"collection": collection_name, "indexes": plan_indexes(explain)}
     
-    # Return Excel file
-    return StreamingResponse(
-        io.BytesIO(output.read()),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": "attachment; filename=reporte_mantenimiento.xlsx",
-            "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        }
+    return {"declared": declared, "endpoints": endpoints}
+
+# Indexes declared at startup. Compound indexes follow the equality filters
+# built by filter_equipment and end in the (created_at, id) page order; the
+# query planner hints them by name (queries.EQUALITY_INDEXES).
+EQUIPMENT_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel(EQUIPMENT_SORT, name="created_at_id"),
+    IndexModel([("equipment_type", ASCENDING)] + EQUIPMENT_SORT, name="type_created_at_id"),
+    IndexModel([("estado_equipo", ASCENDING)] + EQUIPMENT_SORT, name="estado_created_at_id"),
+    IndexModel([("tipo_mantenimiento", ASCENDING)] + EQUIPMENT_SORT, name="mantenimiento_created_at_id"),
+    IndexModel(
+        [("equipment_type", ASCENDING), ("estado_equipo", ASCENDING), ("tipo_mantenimiento", ASCENDING)] + EQUIPMENT_SORT,
+        name="type_estado_mantenimiento_created_at_id"
+    ),
+    IndexModel([("fecha", DESCENDING)], name="fecha_desc"),
+    IndexModel([("serie_lower", ASCENDING)], name="serie_lower"),
+    IndexModel([("nombre_pc_lower", ASCENDING)], name="nombre_pc_lower"),
+    IndexModel(
+        [("marca", TEXT), ("modelo", TEXT), ("serie", TEXT), ("nombre_pc", TEXT), ("observaciones", TEXT)],
+        name="equipment_text",
+        weights={"serie": 10, "nombre_pc": 10, "marca": 5, "modelo": 5, "observaciones": 1},
+        default_language="spanish"
+    ),
+    *EVENT_INDEXES,
+    *REPORT_INDEXES,
+]
+
+EXPORT_JOB_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel([("filter_key", ASCENDING), ("created_at", DESCENDING)], name="filter_key_created_at"),
+    # Job documents outlive their artifacts by a day, then Mongo drops them
+    IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=24 * 60 * 60),
+]
+
+REFRESH_TOKEN_INDEXES = [
+    IndexModel([("token_hash", ASCENDING)], name="token_hash_unique", unique=True),
+    IndexModel([("family_id", ASCENDING)], name="family_id"),
+    IndexModel([("username", ASCENDING)], name="username"),
+    # Expired tokens, revoked or not, are removed by Mongo
+    IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+]
+
+EVENT_TICKET_INDEXES = [
+    IndexModel([("ticket_hash", ASCENDING)], name="ticket_hash_unique", unique=True),
+    IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+]
+
+USER_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+]
+
+async def ensure_indexes():
+    collection_indexes = (
+        (db.equipment, EQUIPMENT_INDEXES),
+        (db.users, USER_INDEXES),
+        (db.export_jobs, EXPORT_JOB_INDEXES),
+        (db.refresh_tokens, REFRESH_TOKEN_INDEXES),
+        (db.event_tickets, EVENT_TICKET_INDEXES),
+        (db.assets, ASSET_INDEXES + SCHEDULE_INDEXES),
+        (db.daily_rollups, ROLLUP_INDEXES),
+        (db.audit_log, audit_indexes(AUDIT_RETENTION_DAYS)),
     )
+    for collection, indexes in collection_indexes:
+        try:
+            await collection.create_indexes(indexes)
+        except OperationFailure as e:
+            # Duplicate data or a conflicting index must not keep the API from starting
+            logging.error(f"Could not create indexes on {collection.name}: {e}")
+    # Hint only the equipment indexes that actually exist
+    equipment_indexes = await db.equipment.index_information()
+    missing = [name for name in EQUALITY_INDEXES.values() if name not in equipment_indexes]
+    if missing:
+        logging.error(f"Equipment indexes missing, queries will not hint them: {', '.join(missing)}")
+    query_planner.use_indexes(equipment_indexes)
 
-# Initialize admin user if not exists
-@app.on_event("startup")
-async def create_admin_user():
+async def ensure_admin_user():
     admin_user = await db.users.find_one({"username": "admin"})
     if not admin_user:
         admin_data = {
@@ -610,11 +2135,130 @@ async def create_admin_user():
             "role": "admin",
             "is_active": True,
             "created_at": datetime.utcnow(),
-            "password": get_password_hash("admin123")  # Change this password!
+            "password": await asyncio.get_running_loop().run_in_executor(
+                password_executor, get_password_hash, "admin123"  # Change this password!
+            )
         }
         await db.users.insert_one(admin_data)
         logging.info("Admin user created with username: admin, password: admin123")
 
+async def build_search_index():
+    global search_index
+    index = EquipmentSearchIndex(max_documents=SEARCH_INDEX_MAX_DOCUMENTS)
+    projection = {"_id": 0, **{field: 1 for field in SEARCHABLE_FIELDS + SUMMARY_FIELDS}}
+    search_index_state["building"] = True
+    search_index_state["pending"] = []
+    try:
+        indexed = 0
+        async for equipment in db.equipment.find({}, projection).batch_size(1000):
+            index.add(equipment, keep_sorted=False)
+            indexed += 1
+            if indexed % 1000 == 0:
+                await asyncio.sleep(0)
+        index.finalize()
+        # Writes that happened while the cursor was open
+        for saved, deleted in search_index_state["pending"]:
+            apply_search_index_changes(index, saved, deleted)
+    finally:
+        search_index_state["building"] = False
+        search_index_state["pending"] = []
+    search_index = index
+    search_index_state["ready"] = True
+    search_index_state["built_at"] = datetime.utcnow()
+    logging.info(f"Search index built with {indexed} equipment records")
+
+async def refresh_search_index():
+    while True:
+        try:
+            await build_search_index()
+        except Exception:
+            logging.exception("Search index build failed")
+        if SEARCH_INDEX_REBUILD_MINUTES <= 0:
+            return
+        await asyncio.sleep(SEARCH_INDEX_REBUILD_MINUTES * 60)
+
+def start_background_task(coroutine):
+    task = asyncio.create_task(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def migrate_assets_if_missing():
+    # First start after the assets collection was introduced
+    if await db.assets.find_one({}, {"_id": 1}) or not await db.equipment.find_one({}, {"_id": 1}):
+        return
+    try:
+        migrated = await migrate_assets(db)
+        logging.info(f"Assets migrated: {migrated} assets")
+        schedule_wakeup.set()
+    except Exception:
+        logging.exception("Asset migration failed")
+
+async def backfill_rollups_if_missing():
+    # First start after the daily rollups were introduced
+    if await db.daily_rollups.find_one({}, {"_id": 1}) or not await db.equipment.find_one({}, {"_id": 1}):
+        return
+    try:
+        buckets = await rebuild_rollups(db)
+        logging.info(f"Daily rollups backfilled: {buckets} buckets")
+    except Exception:
+        logging.exception("Daily rollup backfill failed")
+
+async def run_preventive_scheduler():
+    while True:
+        schedule_wakeup.clear()
+        try:
+            recomputed = await recompute_due_dates(db, PREVENTIVE_INTERVAL_DAYS)
+            if recomputed:
+                logging.info(f"Preventive due dates recomputed for {recomputed} assets")
+        except Exception:
+            logging.exception("Preventive due date recomputation failed")
+        try:
+            await asyncio.wait_for(schedule_wakeup.wait(), timeout=PREVENTIVE_SCHEDULER_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+async def backfill_search_fields():
+    # Records written before the normalized search fields existed
+    result = await db.equipment.update_many(
+        {"serie_lower": {"$exists": False}},
+        [{"$set": {"serie_lower": {"$toLower": "$serie"}, "nombre_pc_lower": {"$toLower": "$nombre_pc"}}}]
+    )
+    if result.modified_count:
+        logging.info(f"Backfilled search fields on {result.modified_count} equipment records")
+
+async def backfill_repair_stamps():
+    # Records already under repair before the transitions were stamped
+    result = await db.equipment.update_many(
+        {"estado_equipo": REPAIR_STATE, "repair_started_at": {"$exists": False}},
+        [{"$set": {"repair_started_at": {"$ifNull": ["$updated_at", "$fecha"]}}}]
+    )
+    if result.modified_count:
+        logging.info(f"Backfilled repair start on {result.modified_count} equipment records")
+
+# Schema bootstrap: indexes, the default admin user and the dashboard counters,
+# then background work such as the typeahead index
+@app.on_event("startup")
+async def bootstrap_database():
+    await ensure_indexes()
+    await backfill_search_fields()
+    await backfill_repair_stamps()
+    await ensure_admin_user()
+    if not await db.dashboard_counters.find_one({"_id": DASHBOARD_COUNTERS_ID}):
+        await rebuild_dashboard_counters()
+    start_background_task(migrate_assets_if_missing())
+    start_background_task(backfill_rollups_if_missing())
+    await reschedule_if_intervals_changed(db, PREVENTIVE_INTERVAL_DAYS)
+    start_background_task(run_preventive_scheduler())
+    start_background_task(audit_writer.run())
+    if EVENTS_CHANGE_STREAM:
+        start_background_task(watch_changes(
+            db.equipment, publish_equipment_change,
+            full_document="updateLookup", full_document_before_change="whenAvailable"
+        ))
+        start_background_task(watch_changes(db.dashboard_counters, publish_counters_change, full_document="updateLookup"))
+    if SEARCH_INDEX_ENABLED:
+        start_background_task(refresh_search_index())
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -635,4 +2279,13 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    try:
+        await audit_writer.flush()
+    except Exception:
+        logging.exception("Audit log entries could not be written at shutdown")
+    event_bus.close()
+    export_pool.shutdown(wait=False, cancel_futures=True)
+    password_executor.shutdown(wait=False, cancel_futures=True)
+    for task in list(background_tasks):
+        task.cancel()
     client.close()
\ No newline at end of file
@@ -1,6 +1,9 @@
 import requests
 import sys
+import csv
+import io
 import json
+import time
 from datetime import datetime, timedelta
 
 class EquipmentMaintenanceAPITester:
@@ -13,6 +16,7 @@ class EquipmentMaintenanceAPITester:
         self.tests_passed = 0
         self.created_user_id = None
         self.created_equipment_id = None
+        self.batch_equipment_ids = []
 
     def run_test(self, name, method, endpoint, expected_status, data=None, token=None, files=None):
         """Run a single API test"""
@@ -107,6 +111,79 @@ class EquipmentMaintenanceAPITester:
                 return True
         return False
 
+    def test_refresh_token(self):
+        """Test refresh token rotation, reuse detection and logout"""
+        success, response = self.run_test(
+            "Login For Refresh Token",
+            "POST",
+            "login",
+            200,
+            data={"username": "admin", "password": "admin123"}
+        )
+        if not success or not response.get('refresh_token'):
+            print("❌ Login did not return a refresh token")
+            return False
+        first_token = response['refresh_token']
+        
+        success, response = self.run_test(
+            "Rotate Refresh Token",
+            "POST",
+            "token/refresh",
+            200,
+            data={"refresh_token": first_token}
+        )
+        if not success or not response.get('access_token') or response.get('refresh_token') in (None, first_token):
+            print("❌ Refresh did not rotate the refresh token")
+            return False
+        second_token = response['refresh_token']
+        
+        # Presenting a rotated token again revokes the whole family
+        success, _ = self.run_test(
+            "Reuse Rotated Refresh Token",
+            "POST",
+            "token/refresh",
+            401,
+            data={"refresh_token": first_token}
+        )
+        if not success:
+            return False
+        success, _ = self.run_test(
+            "Refresh With Revoked Family",
+            "POST",
+            "token/refresh",
+            401,
+            data={"refresh_token": second_token}
+        )
+        if not success:
+            return False
+        
+        success, response = self.run_test(
+            "Login For Logout",
+            "POST",
+            "login",
+            200,
+            data={"username": "admin", "password": "admin123"}
+        )
+        if not success:
+            return False
+        success, _ = self.run_test(
+            "Logout",
+            "POST",
+            "logout",
+            200,
+            data={"refresh_token": response['refresh_token']}
+        )
+        if not success:
+            return False
+        success, _ = self.run_test(
+            "Refresh After Logout",
+            "POST",
+            "token/refresh",
+            401,
+            data={"refresh_token": response['refresh_token']}
+        )
+        return success
+
     def test_admin_user_creation(self):
         """Test admin creating a new user"""
         if not self.admin_token:
@@ -248,6 +325,207 @@ class EquipmentMaintenanceAPITester:
             return True
         return False
 
+    def test_equipment_cursor(self):
+        """Test cursor pagination against the unpaged list order"""
+        if not self.user_token:
+            print("❌ User token not available")
+            return False
+        
+        success, expected = self.run_test(
+            "Get Equipment List For Cursor",
+            "GET",
+            "equipment?limit=4",
+            200,
+            token=self.user_token
+        )
+        if not success:
+            return False
+        expected_ids = [equipment['id'] for equipment in expected]
+        
+        # An empty cursor asks for the first page
+        ids = []
+        cursor = ""
+        while len(ids) < len(expected_ids):
+            success, page = self.run_test(
+                "Get Equipment Page",
+                "GET",
+                f"equipment?limit=2&cursor={cursor}",
+                200,
+                token=self.user_token
+            )
+            if not success or set(page) != {"items", "next_cursor", "total", "facets"}:
+                return False
+            ids.extend(equipment['id'] for equipment in page['items'])
+            if not page['next_cursor']:
+                break
+            cursor = page['next_cursor']
+        print(f"   Paged {len(ids)} items, expected {len(expected_ids)}")
+        if ids[:len(expected_ids)] != expected_ids:
+            return False
+        
+        # A page that reaches the end has no next cursor
+        success, page = self.run_test(
+            "Get Last Equipment Page",
+            "GET",
+            "equipment?limit=1000&cursor=",
+            200,
+            token=self.user_token
+        )
+        return success and (page['next_cursor'] is None or len(page['items']) == 1000)
+
+    def test_equipment_counts(self):
+        """Test include_total and include_facets on the filter endpoint"""
+        if not self.admin_token:
+            print("❌ Admin token not available")
+            return False
+        
+        # A prefix of this run's own, so the counts are known exactly
+        prefix = f"COUNT-{datetime.now().strftime('%H%M%S%f')}-"
+        fixtures = [
+            ("cpu", "Sala Conteo", "preventivo"),
+            ("cpu", "Sala Conteo", "correctivo"),
+            ("monitor", "Bodega Conteo", "preventivo"),
+        ]
+        batch = {"create": [
+            {
+                "area": area,
+                "equipment_type": equipment_type,
+                "marca": "Lenovo",
+                "modelo": "M70",
+                "serie": f"{prefix}{index}",
+                "tipo_mantenimiento": tipo_mantenimiento,
+                "observaciones": "Conteo de prueba automatizado",
+                "estado_equipo": "operativo"
+            }
+            for index, (equipment_type, area, tipo_mantenimiento) in enumerate(fixtures)
+        ]}
+        success, response = self.run_test(
+            "Create Count Fixtures",
+            "POST",
+            "equipment/batch",
+            200,
+            data=batch,
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        self.batch_equipment_ids.extend(result['id'] for result in response['results'] if result['status'] == "ok")
+        
+        filter_data = {"search": prefix, "search_mode": "prefix", "estado_equipo": "operativo"}
+        success, page = self.run_test(
+            "Filter With Total And Facets",
+            "POST",
+            "equipment/filter?include_total=true&include_facets=true&limit=2",
+            200,
+            data=filter_data,
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        print(f"   Total: {page['total']}, facets: {page['facets']}")
+        expected_facets = {
+            "equipment_type": {"cpu": 2, "monitor": 1},
+            "area": {"Sala Conteo": 2, "Bodega Conteo": 1},
+            "estado_equipo": {"operativo": 3},
+            "tipo_mantenimiento": {"preventivo": 2, "correctivo": 1}
+        }
+        # The counts cover the whole filter, not just the two-item page
+        if len(page['items']) != 2 or not page['next_cursor'] or page['total'] != 3 or page['facets'] != expected_facets:
+            return False
+        
+        filter_data["search"] = f"{prefix}0"
+        success, page = self.run_test(
+            "Filter With Total Only",
+            "POST",
+            "equipment/filter?include_total=true",
+            200,
+            data=filter_data,
+            token=self.admin_token
+        )
+        if not success or page['total'] != 1 or page['facets'] is not None or len(page['items']) != 1:
+            return False
+        
+        # Without either flag the response stays a plain list
+        success, items = self.run_test(
+            "Filter Without Counts",
+            "POST",
+            "equipment/filter",
+            200,
+            data=filter_data,
+            token=self.admin_token
+        )
+        return success and isinstance(items, list) and [item['serie'] for item in items] == [f"{prefix}0"]
+
+    def test_equipment_views(self):
+        """Test the per-id GET, view=summary and fields= projections"""
+        if not self.user_token or not self.created_equipment_id:
+            print("❌ User token or equipment ID not available")
+            return False
+        
+        success, equipment = self.run_test(
+            "Get Equipment By ID",
+            "GET",
+            f"equipment/{self.created_equipment_id}",
+            200,
+            token=self.user_token
+        )
+        if not success:
+            return False
+        # Whole record, without Mongo's _id or the lowercased search fields
+        if not {"id", "serie", "observaciones", "created_by", "created_at", "fecha"} <= set(equipment):
+            return False
+        if set(equipment) & {"_id", "serie_lower", "nombre_pc_lower"}:
+            return False
+        
+        success, _ = self.run_test(
+            "Get Missing Equipment By ID",
+            "GET",
+            "equipment/missing-equipment-id",
+            404,
+            token=self.user_token
+        )
+        if not success:
+            return False
+        
+        success, items = self.run_test(
+            "Get Equipment Summary View",
+            "GET",
+            "equipment?view=summary&limit=5",
+            200,
+            token=self.user_token
+        )
+        if not success or not items:
+            return False
+        summary_fields = {
+            "id", "created_at", "area", "equipment_type", "nombre_pc", "marca", "modelo", "serie", "fecha",
+            "tipo_mantenimiento", "estado_equipo", "tecnico_responsable"
+        }
+        print(f"   Summary keys: {sorted(items[0])}")
+        if any(not set(item) <= summary_fields or "serie" not in item for item in items):
+            return False
+        if any(set(item) & {"observaciones", "created_by", "updated_at", "updated_by"} for item in items):
+            return False
+        
+        success, items = self.run_test(
+            "Get Equipment Fields",
+            "GET",
+            "equipment?fields=serie,marca&limit=5",
+            200,
+            token=self.user_token
+        )
+        # id and created_at always come back for the page cursor
+        if not success or not items or any(set(item) != {"id", "created_at", "serie", "marca"} for item in items):
+            return False
+        
+        success, _ = self.run_test(
+            "Get Equipment Unknown Field",
+            "GET",
+            "equipment?fields=serie,password",
+            400,
+            token=self.user_token
+        )
+        return success
+
     def test_equipment_filters(self):
         """Test equipment filtering"""
         if not self.user_token:
@@ -298,6 +576,140 @@ class EquipmentMaintenanceAPITester:
             return True
         return False
 
+    def get_dashboard_counts(self, name):
+        success, response = self.run_test(
+            name,
+            "GET",
+            "dashboard",
+            200,
+            token=self.admin_token
+        )
+        return response if success else None
+
+    def test_equipment_batch(self):
+        """Test a mixed create/update/delete batch and its dashboard counters"""
+        if not self.admin_token:
+            print("❌ Admin token not available")
+            return False
+        
+        def batch_equipment(serie):
+            return {
+                "area": "Oficina Principal",
+                "equipment_type": "monitor",
+                "marca": "HP",
+                "modelo": "E24",
+                "serie": serie,
+                "tipo_mantenimiento": "limpieza",
+                "observaciones": "Lote de prueba automatizado",
+                "estado_equipo": "operativo"
+            }
+        
+        stamp = datetime.now().strftime('%H%M%S')
+        success, response = self.run_test(
+            "Batch Create Equipment",
+            "POST",
+            "equipment/batch",
+            200,
+            data={"create": [batch_equipment(f"BATCH-A-{stamp}"), batch_equipment(f"BATCH-B-{stamp}")]},
+            token=self.admin_token
+        )
+        if not success or [result['status'] for result in response['results']] != ["ok", "ok"]:
+            return False
+        first_id, second_id = [result['id'] for result in response['results']]
+        self.batch_equipment_ids.extend([first_id, second_id])
+        
+        before = self.get_dashboard_counts("Dashboard Before Batch")
+        if not before:
+            return False
+        
+        batch = {
+            "create": [batch_equipment(f"BATCH-C-{stamp}")],
+            "update": [
+                {"id": first_id, "changes": {"estado_equipo": "en_reparacion"}},
+                {"id": "missing-equipment-id", "changes": {"observaciones": "No existe"}}
+            ],
+            "delete": [second_id, "missing-equipment-id-2"]
+        }
+        success, response = self.run_test(
+            "Mixed Equipment Batch",
+            "POST",
+            "equipment/batch",
+            200,
+            data=batch,
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        statuses = [(result['operation'], result['index'], result['status']) for result in response['results']]
+        print(f"   Batch results: {statuses}")
+        expected = [
+            ("create", 0, "ok"),
+            ("update", 0, "ok"),
+            ("update", 1, "not_found"),
+            ("delete", 0, "ok"),
+            ("delete", 1, "not_found")
+        ]
+        if statuses != expected:
+            return False
+        self.batch_equipment_ids.append(response['results'][0]['id'])
+        self.batch_equipment_ids.remove(second_id)
+        if response['results'][1]['equipment']['estado_equipo'] != "en_reparacion":
+            return False
+        
+        # One monitor created and one deleted; one operativo moved to en_reparacion
+        after = self.get_dashboard_counts("Dashboard After Batch")
+        if not after:
+            return False
+        by_status_before, by_status_after = before['equipments_by_status'], after['equipments_by_status']
+        print(f"   Total: {before['total_equipments']} -> {after['total_equipments']}")
+        return (
+            after['total_equipments'] == before['total_equipments']
+            and after['equipments_by_type'].get('monitor', 0) == before['equipments_by_type'].get('monitor', 0)
+            and by_status_after.get('en_reparacion', 0) == by_status_before.get('en_reparacion', 0) + 1
+            and by_status_after.get('operativo', 0) == by_status_before.get('operativo', 0) - 1
+        )
+
+    def test_equipment_import(self):
+        """Test a CSV import with a row that fails validation"""
+        if not self.admin_token:
+            print("❌ Admin token not available")
+            return False
+        
+        stamp = datetime.now().strftime('%H%M%S')
+        rows = [
+            "Área,Tipo de Equipo,Marca,Modelo,Serie,Fecha Mantenimiento,Tipo Mantenimiento,Estado Equipo,Observaciones",
+            f"Oficina Principal,cpu,Dell,OptiPlex 3080,IMPORT-A-{stamp},2024-01-15,preventivo,operativo,Importado",
+            f"Oficina Principal,cpu,,OptiPlex 3080,IMPORT-B-{stamp},2024-01-15,preventivo,operativo,Sin marca",
+            f"Almacén,impresora,Epson,L3150,IMPORT-C-{stamp},2024-02-01,limpieza,operativo,Importado",
+        ]
+        success, response = self.run_test(
+            "Import Equipment CSV",
+            "POST",
+            "equipment/import",
+            200,
+            token=self.admin_token,
+            files={"file": ("equipos.csv", "\n".join(rows).encode("utf-8"), "text/csv")}
+        )
+        if not success:
+            return False
+        print(f"   Inserted: {response['inserted']}, failed: {response['failed']}, errors: {response['errors']}")
+        if response['inserted'] != 2 or response['failed'] != 1 or response['errors'][0]['row'] != 3:
+            return False
+        
+        success, imported = self.run_test(
+            "Find Imported Equipment",
+            "POST",
+            "equipment/filter",
+            200,
+            data={"search": "IMPORT-", "search_mode": "prefix"},
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        imported = [equipment for equipment in imported if equipment['serie'].endswith(stamp)]
+        self.batch_equipment_ids.extend(equipment['id'] for equipment in imported)
+        return sorted(equipment['serie'] for equipment in imported) == [f"IMPORT-A-{stamp}", f"IMPORT-C-{stamp}"]
+
     def test_dashboard_stats(self):
         """Test dashboard statistics"""
         if not self.user_token:
@@ -339,6 +751,333 @@ class EquipmentMaintenanceAPITester:
         
         return success
 
+    def download_export(self, export_format, filter_data):
+        # Exports are files, not JSON, so the body is read here instead of run_test
+        self.tests_run += 1
+        print(f"\n🔍 Testing {export_format.upper()} Export...")
+        response = requests.post(
+            f"{self.api_url}/export",
+            params={"format": export_format},
+            json=filter_data,
+            headers={'Authorization': f'Bearer {self.user_token}'}
+        )
+        if response.status_code != 200:
+            print(f"❌ Failed - Expected 200, got {response.status_code}")
+            return None
+        self.tests_passed += 1
+        print(f"✅ Passed - Status: {response.status_code}")
+        return response.content
+
+    def test_export_formats(self):
+        """Test that CSV and Parquet exports parse back with the expected columns"""
+        if not self.user_token or not self.created_equipment_id:
+            print("❌ User token or equipment ID not available")
+            return False
+        
+        success, equipment = self.run_test(
+            "Get Exported Equipment",
+            "GET",
+            f"equipment/{self.created_equipment_id}",
+            200,
+            token=self.user_token
+        )
+        if not success:
+            return False
+        filter_data = {"search": equipment['serie'], "search_mode": "exact"}
+        
+        content = self.download_export("csv", filter_data)
+        if content is None:
+            return False
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8'))))
+        header = rows[0]
+        if "Serie" not in header or "Fecha Mantenimiento" not in header:
+            return False
+        records = [dict(zip(header, row)) for row in rows[1:]]
+        print(f"   CSV rows: {len(records)}")
+        if not any(record['ID'] == equipment['id'] for record in records):
+            return False
+        if any(record['Serie'] != equipment['serie'] for record in records):
+            return False
+        
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("   pyarrow not installed, skipping Parquet check")
+            return True
+        content = self.download_export("parquet", filter_data)
+        if content is None:
+            return False
+        table = pq.read_table(io.BytesIO(content))
+        if table.column_names != header or table.num_rows != len(records):
+            return False
+        # Dates come back typed, not as text
+        for column in ("Fecha Mantenimiento", "Fecha Creación"):
+            if not pa.types.is_timestamp(table.schema.field(column).type):
+                print(f"   {column} is {table.schema.field(column).type}")
+                return False
+        return equipment['id'] in table.column("ID").to_pylist()
+
+    def test_export_job(self):
+        """Test background export job submission, polling and download"""
+        if not self.user_token:
+            print("❌ User token not available")
+            return False
+            
+        success, job = self.run_test(
+            "Create Export Job",
+            "POST",
+            "export/jobs",
+            200,
+            data={},
+            token=self.user_token
+        )
+        if not success:
+            return False
+        
+        for _ in range(30):
+            success, job = self.run_test(
+                "Poll Export Job",
+                "GET",
+                f"export/jobs/{job['id']}",
+                200,
+                token=self.user_token
+            )
+            if not success or job['status'] in ('completed', 'failed'):
+                break
+            time.sleep(1)
+        
+        print(f"   Job status: {job.get('status')} ({job.get('processed')}/{job.get('total')})")
+        if job.get('status') != 'completed':
+            return False
+        
+        success, _ = self.run_test(
+            "Download Export Job",
+            "GET",
+            f"export/jobs/{job['id']}/download",
+            200,
+            token=self.user_token
+        )
+        return success
+
+    def test_asset_schedule(self):
+        """Test the per-asset state, timeline and preventive due queue"""
+        if not self.user_token:
+            print("❌ User token not available")
+            return False
+        
+        success, asset = self.run_test(
+            "Get Asset",
+            "GET",
+            "assets/TEST123456",
+            200,
+            token=self.user_token
+        )
+        if not success:
+            return False
+        print(f"   Asset maintenances: {asset['maintenance_count']}, next due: {asset.get('next_due')}")
+        
+        success, timeline = self.run_test(
+            "Get Asset Timeline",
+            "GET",
+            "assets/TEST123456/timeline",
+            200,
+            token=self.user_token
+        )
+        if not success or not timeline:
+            return False
+        
+        success, due = self.run_test(
+            "Get Due Assets",
+            "GET",
+            "assets/due?days=365",
+            200,
+            token=self.user_token
+        )
+        if success:
+            print(f"   Overdue: {len(due['overdue'])}, upcoming: {len(due['upcoming'])}")
+        return success
+
+    def test_timeseries(self):
+        """Test the maintenance time series read from the daily rollups"""
+        if not self.user_token:
+            print("❌ User token not available")
+            return False
+        
+        success, timeseries = self.run_test(
+            "Get Maintenance Timeseries",
+            "GET",
+            "analytics/timeseries?interval=month&group_by=area",
+            200,
+            token=self.user_token
+        )
+        if success:
+            print(f"   Periods: {len(timeseries['periods'])}, series: {len(timeseries['series'])}")
+        return success
+
+    def test_technician_report(self):
+        """Test the technician workload and time-to-repair report"""
+        if not self.user_token:
+            print("❌ User token not available")
+            return False
+        
+        success, report = self.run_test(
+            "Get Technician Report",
+            "GET",
+            "reports/technicians",
+            200,
+            token=self.user_token
+        )
+        if success:
+            print(f"   Technicians: {len(report['technicians'])}, repairs: {report['repairs']}, MTTR: {report['mttr_hours']}")
+        return success
+
+    def test_audit_log(self):
+        """Test the audit history of the test equipment"""
+        if not self.admin_token or not self.created_equipment_id:
+            print("❌ Admin token or equipment ID not available")
+            return False
+        
+        # Entries are written in batches off the request path
+        for _ in range(10):
+            success, page = self.run_test(
+                "Get Equipment Audit Log",
+                "GET",
+                f"admin/audit?entity=equipment&entity_id={self.created_equipment_id}",
+                200,
+                token=self.admin_token
+            )
+            if not success:
+                return False
+            updates = [entry for entry in page['items'] if entry['action'] == "update"]
+            if updates:
+                break
+            time.sleep(1)
+        print(f"   Audit entries: {[entry['action'] for entry in page['items']]}")
+        if not updates:
+            return False
+        
+        # The update made in test_equipment_update, field by field
+        changes = {change['field']: (change['old'], change['new']) for change in updates[-1]['changes']}
+        print(f"   Update changes: {changes}")
+        return (
+            updates[-1]['actor'] == "admin"
+            and changes.get('observaciones') == ("Mantenimiento de prueba automatizado", "Observaciones actualizadas por admin")
+            and changes.get('estado_equipo') == ("operativo", "en_reparacion")
+        )
+
+    def create_event_ticket(self):
+        success, response = self.run_test(
+            "Create Event Ticket",
+            "POST",
+            "events/ticket",
+            200,
+            token=self.admin_token
+        )
+        return response.get('ticket') if success else None
+
+    def open_event_stream(self, ticket, last_event_id=None):
+        headers = {'Last-Event-ID': last_event_id} if last_event_id else {}
+        return requests.get(
+            f"{self.api_url}/events",
+            params={"ticket": ticket},
+            headers=headers,
+            stream=True,
+            timeout=10
+        )
+
+    def read_equipment_event(self, response, equipment_id):
+        # Reads server-sent events until one about equipment_id arrives
+        event = {}
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                if not line.startswith(":"):
+                    field, _, value = line.partition(": ")
+                    event[field] = value
+                continue
+            if event.get('event') == "equipment":
+                data = json.loads(event['data'])
+                if data.get('id') == equipment_id:
+                    return event['id'], data
+            event = {}
+        return None, None
+
+    def test_event_feed(self):
+        """Test the change feed stream and Last-Event-ID replay"""
+        if not self.admin_token or not self.created_equipment_id:
+            print("❌ Admin token or equipment ID not available")
+            return False
+        
+        success, stats = self.run_test(
+            "Get Event Feed Stats",
+            "GET",
+            "admin/events",
+            200,
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        print(f"   Last event: {stats['last_event_id']}, subscribers: {stats['subscribers']}")
+        
+        ticket = self.create_event_ticket()
+        if not ticket:
+            return False
+        self.tests_run += 1
+        print("\n🔍 Testing Event Stream Replay...")
+        stream = self.open_event_stream(ticket)
+        try:
+            if stream.status_code != 200:
+                print(f"❌ Failed - Expected 200, got {stream.status_code}")
+                return False
+            success, _ = self.run_test(
+                "Update Equipment For Event",
+                "PUT",
+                f"equipment/{self.created_equipment_id}",
+                200,
+                data={"observaciones": "Evento en vivo"},
+                token=self.admin_token
+            )
+            if not success:
+                return False
+            first_id, data = self.read_equipment_event(stream, self.created_equipment_id)
+        finally:
+            stream.close()
+        if not first_id or data['equipment']['observaciones'] != "Evento en vivo":
+            print("❌ Failed - Live equipment event not received")
+            return False
+        
+        # Written while disconnected: reconnecting from first_id replays it
+        success, _ = self.run_test(
+            "Update Equipment While Disconnected",
+            "PUT",
+            f"equipment/{self.created_equipment_id}",
+            200,
+            data={"observaciones": "Evento perdido"},
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        # Tickets are single-use
+        stream = self.open_event_stream(ticket, first_id)
+        stream.close()
+        if stream.status_code != 401:
+            print(f"❌ Failed - Reused ticket: expected 401, got {stream.status_code}")
+            return False
+        ticket = self.create_event_ticket()
+        if not ticket:
+            return False
+        stream = self.open_event_stream(ticket, first_id)
+        try:
+            replayed_id, data = self.read_equipment_event(stream, self.created_equipment_id)
+        finally:
+            stream.close()
+        if not replayed_id or replayed_id == first_id or data['equipment']['observaciones'] != "Evento perdido":
+            print("❌ Failed - Missed equipment event not replayed")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - Replayed {replayed_id} after {first_id}")
+        return True
+
     def test_unauthorized_access(self):
         """Test unauthorized access to admin endpoints"""
         if not self.user_token:
@@ -356,6 +1095,26 @@ class EquipmentMaintenanceAPITester:
         
         return success
 
+    def test_index_report(self):
+        """Test index usage report"""
+        if not self.admin_token:
+            print("❌ Admin token not available")
+            return False
+            
+        success, response = self.run_test(
+            "Get Index Report",
+            "GET",
+            "admin/indexes",
+            200,
+            token=self.admin_token
+        )
+        
+        if success:
+            for endpoint, info in response['endpoints'].items():
+                print(f"   {endpoint}: {info['indexes']}")
+            return 'COLLSCAN' not in response['endpoints']['get_current_user']['indexes']
+        return False
+
     def cleanup(self):
         """Clean up created test data"""
         if self.admin_token and self.created_user_id:
@@ -375,6 +1134,16 @@ class EquipmentMaintenanceAPITester:
                 200,
                 token=self.admin_token
             )
+        
+        if self.admin_token and self.batch_equipment_ids:
+            self.run_test(
+                "Delete Batch Test Equipment",
+                "POST",
+                "equipment/batch",
+                200,
+                data={"delete": self.batch_equipment_ids},
+                token=self.admin_token
+            )
 
 def main():
     print("🚀 Starting Equipment Maintenance System API Tests")
@@ -386,16 +1155,30 @@ def main():
     tests = [
         ("Admin Login", tester.test_admin_login),
         ("User Registration", tester.test_user_registration),
+        ("Refresh Token", tester.test_refresh_token),
         ("Admin User Creation", tester.test_admin_user_creation),
         ("Get All Users", tester.test_get_all_users),
         ("User Management", tester.test_user_management),
         ("Equipment Creation", tester.test_equipment_creation),
         ("Equipment List", tester.test_equipment_list),
+        ("Equipment Views", tester.test_equipment_views),
         ("Equipment Filters", tester.test_equipment_filters),
         ("Equipment Update", tester.test_equipment_update),
+        ("Equipment Batch", tester.test_equipment_batch),
+        ("Equipment Import", tester.test_equipment_import),
+        ("Equipment Cursor", tester.test_equipment_cursor),
+        ("Equipment Counts", tester.test_equipment_counts),
         ("Dashboard Stats", tester.test_dashboard_stats),
         ("Excel Export", tester.test_excel_export),
-        ("Unauthorized Access", tester.test_unauthorized_access)
+        ("Export Formats", tester.test_export_formats),
+        ("Export Job", tester.test_export_job),
+        ("Asset Schedule", tester.test_asset_schedule),
+        ("Timeseries", tester.test_timeseries),
+        ("Technician Report", tester.test_technician_report),
+        ("Audit Log", tester.test_audit_log),
+        ("Event Feed", tester.test_event_feed),
+        ("Unauthorized Access", tester.test_unauthorized_access),
+        ("Index Report", tester.test_index_report)
     ]
     
     failed_tests = []
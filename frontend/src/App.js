@@ -2,6 +2,7 @@ import React, { useState, useEffect, createContext, useContext } from 'react';
 import { BrowserRouter, Routes, Route, Navigate } from 'react-router-dom';
 import axios from 'axios';
 import './App.css';
+import { useChangeEvents } from './hooks/use-change-events';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -9,6 +10,41 @@ const API = `${BACKEND_URL}/api`;
 // Auth Context
 const AuthContext = createContext();
 
+const storeSession = ({ access_token, refresh_token }) => {
+  localStorage.setItem('token', access_token);
+  if (refresh_token) {
+    localStorage.setItem('refreshToken', refresh_token);
+  }
+  axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
+};
+
+const clearSession = () => {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refreshToken');
+  delete axios.defaults.headers.common['Authorization'];
+};
+
+// Renew the access token once per burst of 401s; concurrent callers share the request
+let refreshPromise = null;
+
+const refreshSession = () => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    refreshPromise = (refreshToken
+      ? axios.post(`${API}/token/refresh`, { refresh_token: refreshToken })
+      : Promise.reject(new Error('No refresh token'))
+    )
+      .then((response) => {
+        storeSession(response.data);
+        return response.data.access_token;
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 export const useAuth = () => {
   const context = useContext(AuthContext);
   if (!context) {
@@ -21,6 +57,31 @@ const AuthProvider = ({ children }) => {
   const [user, setUser] = useState(null);
   const [loading, setLoading] = useState(true);
 
+  useEffect(() => {
+    // Expired access tokens are renewed with the refresh token and the request replayed
+    const interceptor = axios.interceptors.response.use(
+      (response) => response,
+      async (error) => {
+        const original = error.config;
+        const isAuthRequest = original?.url?.endsWith('/login') || original?.url?.endsWith('/token/refresh');
+        if (error.response?.status !== 401 || !original || original._retried || isAuthRequest) {
+          return Promise.reject(error);
+        }
+        original._retried = true;
+        try {
+          const accessToken = await refreshSession();
+          original.headers['Authorization'] = `Bearer ${accessToken}`;
+          return axios(original);
+        } catch (refreshError) {
+          clearSession();
+          setUser(null);
+          return Promise.reject(error);
+        }
+      }
+    );
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
+
   useEffect(() => {
     const token = localStorage.getItem('token');
     if (token) {
@@ -36,8 +97,7 @@ const AuthProvider = ({ children }) => {
       const response = await axios.get(`${API}/me`);
       setUser(response.data);
     } catch (error) {
-      localStorage.removeItem('token');
-      delete axios.defaults.headers.common['Authorization'];
+      clearSession();
     } finally {
       setLoading(false);
     }
@@ -46,11 +106,8 @@ const AuthProvider = ({ children }) => {
   const login = async (username, password) => {
     try {
       const response = await axios.post(`${API}/login`, { username, password });
-      const { access_token, user: userData } = response.data;
-      
-      localStorage.setItem('token', access_token);
-      axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
-      setUser(userData);
+      storeSession(response.data);
+      setUser(response.data.user);
       
       return { success: true };
     } catch (error) {
@@ -74,8 +131,11 @@ const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
-    localStorage.removeItem('token');
-    delete axios.defaults.headers.common['Authorization'];
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      axios.post(`${API}/logout`, { refresh_token: refreshToken }).catch(() => {});
+    }
+    clearSession();
     setUser(null);
   };
 
@@ -375,15 +435,57 @@ const Navigation = ({ currentPage, setCurrentPage, onPasswordChange }) => {
   );
 };
 
+// Dashboard events carry either counter deltas or the counters' new values
+const applyDashboardChange = (stats, { delta, values }) => {
+  const next = { ...stats };
+  Object.entries(delta || values || {}).forEach(([field, change]) => {
+    if (typeof change === 'number') {
+      next[field] = delta ? (next[field] || 0) + change : change;
+      return;
+    }
+    const counts = delta ? { ...next[field] } : {};
+    Object.entries(change).forEach(([name, count]) => {
+      counts[name] = delta ? (counts[name] || 0) + count : count;
+      if (!counts[name]) {
+        delete counts[name];
+      }
+    });
+    next[field] = counts;
+  });
+  return next;
+};
+
 // Dashboard Component
 const Dashboard = () => {
   const [stats, setStats] = useState(null);
+  const [trend, setTrend] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     fetchStats();
+    fetchTrend();
   }, []);
 
+  // Counter deltas from the change feed are applied in place; a reset or
+  // a bulk write reloads the stats
+  useChangeEvents((type, data) => {
+    if (type === 'reset' || (type === 'equipment' && data.action === 'reload')) {
+      fetchStats();
+    } else if (type === 'dashboard') {
+      setStats((current) => current && applyDashboardChange(current, data));
+    }
+  });
+
+  // Last 12 months from the pre-aggregated daily rollups
+  const fetchTrend = async () => {
+    try {
+      const response = await axios.get(`${API}/analytics/timeseries`, { params: { interval: 'month' } });
+      setTrend(response.data);
+    } catch (error) {
+      console.error('Error fetching trend:', error);
+    }
+  };
+
   const fetchStats = async () => {
     try {
       const response = await axios.get(`${API}/dashboard`);
@@ -397,6 +499,9 @@ const Dashboard = () => {
 
   if (loading) return <div className="p-6">Cargando estadísticas...</div>;
 
+  const trendPoints = trend?.series?.[0]?.points || trend?.periods?.map(() => 0) || [];
+  const trendMax = Math.max(1, ...trendPoints);
+
   return (
     <div className="p-6 space-y-6">
       <h2 className="text-2xl font-bold text-gray-900">Dashboard</h2>
@@ -488,6 +593,28 @@ const Dashboard = () => {
           </div>
         </div>
       </div>
+
+      {trend && (
+        <div className="bg-white rounded-lg shadow p-6">
+          <h3 className="text-lg font-medium text-gray-900 mb-4">Mantenimientos por Mes</h3>
+          <div className="flex items-end h-40 space-x-2">
+            {trend.periods.map((period, index) => (
+              <div key={period} className="flex-1 flex flex-col items-center justify-end h-full">
+                <span className="text-xs text-gray-600 mb-1">{trendPoints[index]}</span>
+                <div className="flex-1 w-full flex items-end">
+                  <div
+                    className="w-full bg-blue-500 rounded-t"
+                    style={{ height: `${(trendPoints[index] / trendMax) * 100}%` }}
+                  />
+                </div>
+                <span className="text-xs text-gray-500 mt-1">
+                  {new Date(period).toLocaleDateString('es', { month: 'short', timeZone: 'UTC' })}
+                </span>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
     </div>
   );
 };
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { useAuth } from '../App';
 import EquipmentForm from './EquipmentForm';
+import { useChangeEvents } from '../hooks/use-change-events';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -19,20 +20,87 @@ const EquipmentList = () => {
     estado_equipo: '',
     fecha_inicio: '',
     fecha_fin: '',
-    search: ''
+    search: '',
+    search_mode: 'contains'
   });
   const [currentPage, setCurrentPage] = useState(1);
   const [itemsPerPage] = useState(10);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [activeFilters, setActiveFilters] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [suggestions, setSuggestions] = useState([]);
+  const [total, setTotal] = useState(null);
+  const [facets, setFacets] = useState(null);
 
   useEffect(() => {
     fetchEquipment();
   }, []);
 
+  // Pushed changes keep the loaded rows current without re-fetching. New
+  // records are only prepended to the unfiltered list, where they belong
+  // at the top; bulk writes and lost history reload the current view.
+  useChangeEvents((type, data) => {
+    if (type === 'reset' || (type === 'equipment' && data.action === 'reload')) {
+      reloadList();
+    } else if (type === 'equipment' && data.action === 'delete') {
+      setEquipment((items) => items.filter((item) => item.id !== data.id));
+    } else if (type === 'equipment' && data.action === 'update') {
+      setEquipment((items) => items.map((item) => (item.id === data.id ? { ...item, ...data.equipment } : item)));
+    } else if (type === 'equipment' && data.action === 'create' && !activeFilters) {
+      setEquipment((items) => (items.some((item) => item.id === data.id) ? items : [data.equipment, ...items]));
+    }
+  });
+
+  // Typeahead: ask for suggestions once the user pauses typing
+  useEffect(() => {
+    const query = filters.search.trim();
+    if (query.length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API}/equipment/suggest`, { params: { q: query, limit: 8 } });
+        setSuggestions(response.data);
+      } catch (error) {
+        setSuggestions([]);
+      }
+    }, 200);
+    return () => clearTimeout(timer);
+  }, [filters.search]);
+
+  const facetLabel = (field, value, label) => {
+    const count = facets && facets[field] ? facets[field][value] || 0 : null;
+    return count === null ? label : `${label} (${count})`;
+  };
+
+  const selectSuggestion = (item) => {
+    setFilters({...filters, search: item.serie, search_mode: 'exact'});
+    setSuggestions([]);
+  };
+
+  // Pages are fetched with an opaque cursor; an empty cursor asks for the first page.
+  // Filtered first pages also bring the total and per-field counts.
+  const fetchPage = (pageFilters, cursor = '') => {
+    const params = { cursor, limit: 100, view: 'summary' };
+    if (pageFilters && !cursor) {
+      params.include_total = true;
+      params.include_facets = true;
+    }
+    return pageFilters
+      ? axios.post(`${API}/equipment/filter`, pageFilters, { params })
+      : axios.get(`${API}/equipment`, { params });
+  };
+
   const fetchEquipment = async () => {
     try {
       setLoading(true);
-      const response = await axios.get(`${API}/equipment`);
-      setEquipment(response.data);
+      const response = await fetchPage(null);
+      setEquipment(response.data.items);
+      setNextCursor(response.data.next_cursor);
+      setActiveFilters(null);
+      setTotal(null);
+      setFacets(null);
     } catch (error) {
       console.error('Error fetching equipment:', error);
     } finally {
@@ -40,11 +108,29 @@ const EquipmentList = () => {
     }
   };
 
+  const reloadList = async () => {
+    try {
+      const response = await fetchPage(activeFilters);
+      setEquipment(response.data.items);
+      setNextCursor(response.data.next_cursor);
+      if (activeFilters) {
+        setTotal(response.data.total);
+        setFacets(response.data.facets);
+      }
+    } catch (error) {
+      console.error('Error reloading equipment:', error);
+    }
+  };
+
   const handleFilter = async () => {
     try {
       setLoading(true);
-      const response = await axios.post(`${API}/equipment/filter`, filters);
-      setEquipment(response.data);
+      const response = await fetchPage(filters);
+      setEquipment(response.data.items);
+      setNextCursor(response.data.next_cursor);
+      setTotal(response.data.total);
+      setFacets(response.data.facets);
+      setActiveFilters(filters);
       setCurrentPage(1);
     } catch (error) {
       console.error('Error filtering equipment:', error);
@@ -53,11 +139,25 @@ const EquipmentList = () => {
     }
   };
 
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const response = await fetchPage(activeFilters, nextCursor);
+      setEquipment([...equipment, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading more equipment:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (id) => {
     if (window.confirm('¿Estás seguro de que quieres eliminar este equipo?')) {
       try {
         await axios.delete(`${API}/equipment/${id}`);
-        fetchEquipment();
+        // The change feed removes the row
+        setEquipment((items) => items.filter((item) => item.id !== id));
       } catch (error) {
         alert('Error al eliminar el equipo');
       }
@@ -89,9 +189,15 @@ const EquipmentList = () => {
     fetchEquipment();
   };
 
-  const handleEdit = (equipment) => {
-    setEditingEquipment(equipment);
-    setShowForm(true);
+  // The table holds the summary view; the form needs the full record
+  const handleEdit = async (equipment) => {
+    try {
+      const response = await axios.get(`${API}/equipment/${equipment.id}`);
+      setEditingEquipment(response.data);
+      setShowForm(true);
+    } catch (error) {
+      console.error('Error loading equipment:', error);
+    }
   };
 
   const clearFilters = () => {
@@ -102,7 +208,8 @@ const EquipmentList = () => {
       estado_equipo: '',
       fecha_inicio: '',
       fecha_fin: '',
-      search: ''
+      search: '',
+      search_mode: 'contains'
     });
     fetchEquipment();
   };
@@ -157,15 +264,44 @@ const EquipmentList = () => {
       <div className="card">
         <h3 className="text-lg font-medium text-gray-900 mb-4">Filtros</h3>
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-          <div>
+          <div className="relative">
             <label className="form-label">Buscar</label>
             <input
               type="text"
               value={filters.search}
               onChange={(e) => setFilters({...filters, search: e.target.value})}
+              onBlur={() => setTimeout(() => setSuggestions([]), 150)}
               className="form-input"
               placeholder="Marca, modelo, serie..."
             />
+            {suggestions.length > 0 && (
+              <ul className="absolute z-10 mt-1 w-full bg-white border border-gray-200 rounded-md shadow-lg max-h-60 overflow-auto">
+                {suggestions.map((item) => (
+                  <li
+                    key={item.id}
+                    onMouseDown={() => selectSuggestion(item)}
+                    className="px-3 py-2 cursor-pointer hover:bg-gray-100 text-sm"
+                  >
+                    <span className="font-mono">{item.serie}</span>
+                    <span className="text-gray-500"> · {item.nombre_pc || item.equipment_type} · {item.marca} {item.modelo}</span>
+                  </li>
+                ))}
+              </ul>
+            )}
+          </div>
+
+          <div>
+            <label className="form-label">Modo de Búsqueda</label>
+            <select
+              value={filters.search_mode}
+              onChange={(e) => setFilters({...filters, search_mode: e.target.value})}
+              className="form-select"
+            >
+              <option value="contains">Contiene</option>
+              <option value="text">Texto completo (palabras enteras)</option>
+              <option value="exact">Serie / Nombre PC exacto</option>
+              <option value="prefix">Serie / Nombre PC empieza con</option>
+            </select>
           </div>
 
           <div>
@@ -176,9 +312,9 @@ const EquipmentList = () => {
               className="form-select"
             >
               <option value="">Todos</option>
-              <option value="cpu">CPU</option>
-              <option value="monitor">Monitor</option>
-              <option value="impresora">Impresora</option>
+              <option value="cpu">{facetLabel('equipment_type', 'cpu', 'CPU')}</option>
+              <option value="monitor">{facetLabel('equipment_type', 'monitor', 'Monitor')}</option>
+              <option value="impresora">{facetLabel('equipment_type', 'impresora', 'Impresora')}</option>
             </select>
           </div>
 
@@ -190,7 +326,13 @@ const EquipmentList = () => {
               onChange={(e) => setFilters({...filters, area: e.target.value})}
               className="form-input"
               placeholder="Área del equipo"
+              list="area-options"
             />
+            <datalist id="area-options">
+              {facets && Object.keys(facets.area || {}).map((area) => (
+                <option key={area} value={area}>{facetLabel('area', area, area)}</option>
+              ))}
+            </datalist>
           </div>
 
           <div>
@@ -201,9 +343,9 @@ const EquipmentList = () => {
               className="form-select"
             >
               <option value="">Todos</option>
-              <option value="preventivo">Preventivo</option>
-              <option value="correctivo">Correctivo</option>
-              <option value="limpieza">Limpieza</option>
+              <option value="preventivo">{facetLabel('tipo_mantenimiento', 'preventivo', 'Preventivo')}</option>
+              <option value="correctivo">{facetLabel('tipo_mantenimiento', 'correctivo', 'Correctivo')}</option>
+              <option value="limpieza">{facetLabel('tipo_mantenimiento', 'limpieza', 'Limpieza')}</option>
             </select>
           </div>
 
@@ -215,9 +357,9 @@ const EquipmentList = () => {
               className="form-select"
             >
               <option value="">Todos</option>
-              <option value="operativo">Operativo</option>
-              <option value="en_reparacion">En Reparación</option>
-              <option value="fuera_servicio">Fuera de Servicio</option>
+              <option value="operativo">{facetLabel('estado_equipo', 'operativo', 'Operativo')}</option>
+              <option value="en_reparacion">{facetLabel('estado_equipo', 'en_reparacion', 'En Reparación')}</option>
+              <option value="fuera_servicio">{facetLabel('estado_equipo', 'fuera_servicio', 'Fuera de Servicio')}</option>
             </select>
           </div>
 
@@ -259,7 +401,7 @@ const EquipmentList = () => {
       <div className="card">
         <div className="flex justify-between items-center mb-4">
           <h3 className="text-lg font-medium text-gray-900">
-            Equipos Registrados ({equipment.length})
+            Equipos Registrados ({total !== null ? `${equipment.length} de ${total}` : equipment.length})
           </h3>
         </div>
 
@@ -366,6 +508,14 @@ const EquipmentList = () => {
             </button>
           </div>
         )}
+
+        {nextCursor && (
+          <div className="flex justify-center mt-4">
+            <button onClick={loadMore} disabled={loadingMore} className="btn-secondary">
+              {loadingMore ? 'Cargando...' : 'Cargar más'}
+            </button>
+          </div>
+        )}
       </div>
 
       {/* Form Modal */}
@@ -0,0 +1,61 @@
+import { useEffect, useRef } from 'react';
+import axios from 'axios';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+const EVENT_TYPES = ['equipment', 'dashboard', 'reset'];
+const RECONNECT_DELAY_MS = 5000;
+
+// Subscribes to the server-sent change feed and calls onEvent(type, data).
+// EventSource cannot send the access token, so each stream is opened with a
+// single-use ticket, and a dropped stream is reopened here with a new ticket
+// from the last id seen. Requesting the ticket renews the session if needed;
+// when it cannot be renewed the feed stops.
+export const useChangeEvents = (onEvent) => {
+  const handlerRef = useRef(onEvent);
+  handlerRef.current = onEvent;
+
+  useEffect(() => {
+    let source = null;
+    let timer = null;
+    let lastEventId = '';
+    let active = true;
+
+    const open = (ticket) => {
+      if (!active) {
+        return;
+      }
+      const params = new URLSearchParams({ ticket });
+      if (lastEventId) {
+        params.set('last_event_id', lastEventId);
+      }
+      source = new EventSource(`${API}/events?${params}`);
+      const listener = (event) => {
+        lastEventId = event.lastEventId || lastEventId;
+        handlerRef.current(event.type, JSON.parse(event.data || '{}'));
+      };
+      EVENT_TYPES.forEach((type) => source.addEventListener(type, listener));
+      source.onerror = () => {
+        // The browser's own reconnect would present the spent ticket again
+        source.close();
+        timer = setTimeout(connect, RECONNECT_DELAY_MS);
+      };
+    };
+
+    const connect = () => {
+      if (!active || !localStorage.getItem('token')) {
+        return;
+      }
+      axios.post(`${API}/events/ticket`).then((response) => open(response.data.ticket), () => {});
+    };
+
+    connect();
+    return () => {
+      active = false;
+      clearTimeout(timer);
+      if (source) {
+        source.close();
+      }
+    };
+  }, []);
+};
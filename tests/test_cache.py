@@ -0,0 +1,124 @@
+import asyncio
+
+from cache import MemoryCacheBackend, ResponseCache, make_cache_key
+
+def make_cache(ttl: float = 60) -> ResponseCache:
+    return ResponseCache(MemoryCacheBackend(max_entries=16), ttl=ttl)
+
+class SlowCompute:
+    # Counts calls and blocks until released, so callers overlap
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.value
+
+def test_concurrent_callers_share_one_computation():
+    async def scenario():
+        cache = make_cache()
+        compute = SlowCompute({"total": 3})
+        callers = [asyncio.ensure_future(cache.get_or_compute("stats", compute)) for _ in range(5)]
+        await asyncio.sleep(0)
+        compute.release.set()
+        results = await asyncio.gather(*callers)
+        assert results == [{"total": 3}] * 5
+        assert compute.calls == 1
+        assert (cache.misses, cache.coalesced) == (1, 4)
+        # Stored once computed, so the next caller is a hit
+        assert await cache.get_or_compute("stats", compute) == {"total": 3}
+        assert cache.hits == 1
+        assert not cache.inflight
+    asyncio.run(scenario())
+
+def test_cancelled_caller_does_not_cancel_shared_computation():
+    async def scenario():
+        cache = make_cache()
+        compute = SlowCompute("value")
+        first = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        second = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        compute.release.set()
+        assert await second == "value"
+        assert compute.calls == 1
+    asyncio.run(scenario())
+
+def test_invalidate_discards_every_inflight_result():
+    async def scenario():
+        cache = make_cache()
+        stats = SlowCompute("old stats")
+        listing = SlowCompute("old list")
+        pending = [
+            asyncio.ensure_future(cache.get_or_compute("stats", stats)),
+            asyncio.ensure_future(cache.get_or_compute("list", listing)),
+        ]
+        await asyncio.sleep(0)
+        await cache.invalidate()
+        stats.release.set()
+        listing.release.set()
+        # Callers already waiting still get their result, but it is not stored
+        assert await asyncio.gather(*pending) == ["old stats", "old list"]
+        assert cache.backend.size() == 0
+        assert not cache.inflight
+    asyncio.run(scenario())
+
+def test_invalidate_key_discards_only_that_key():
+    async def scenario():
+        cache = make_cache()
+        stats = SlowCompute("old stats")
+        listing = SlowCompute("list")
+        pending = [
+            asyncio.ensure_future(cache.get_or_compute("stats", stats)),
+            asyncio.ensure_future(cache.get_or_compute("list", listing)),
+        ]
+        await asyncio.sleep(0)
+        await cache.invalidate_key("stats")
+        # A caller after the invalidation starts a fresh computation
+        fresh = SlowCompute("new stats")
+        refreshed = asyncio.ensure_future(cache.get_or_compute("stats", fresh))
+        await asyncio.sleep(0)
+        for compute in (stats, listing, fresh):
+            compute.release.set()
+        assert await asyncio.gather(*pending, refreshed) == ["old stats", "list", "new stats"]
+        assert (stats.calls, fresh.calls) == (1, 1)
+        assert await cache.backend.get("stats") == (True, "new stats")
+        assert await cache.backend.get("list") == (True, "list")
+    asyncio.run(scenario())
+
+def test_invalidate_key_removes_stored_entry():
+    async def scenario():
+        cache = make_cache()
+        await cache.backend.set("stats", "cached", cache.ttl)
+        await cache.backend.set("list", "cached", cache.ttl)
+        await cache.invalidate_key("stats")
+        assert await cache.backend.get("stats") == (False, None)
+        assert await cache.backend.get("list") == (True, "cached")
+    asyncio.run(scenario())
+
+def test_memory_backend_evicts_least_recently_used():
+    async def scenario():
+        backend = MemoryCacheBackend(max_entries=2)
+        await backend.set("a", 1, 60)
+        await backend.set("b", 2, 60)
+        await backend.get("a")
+        await backend.set("c", 3, 60)
+        assert await backend.get("b") == (False, None)
+        assert await backend.get("a") == (True, 1)
+        assert backend.evictions == 1
+    asyncio.run(scenario())
+
+def test_memory_backend_expires_entries():
+    async def scenario():
+        backend = MemoryCacheBackend(max_entries=2)
+        await backend.set("a", 1, -1)
+        assert await backend.get("a") == (False, None)
+        assert backend.size() == 0
+    asyncio.run(scenario())
+
+def test_cache_key_ignores_parameter_order():
+    assert make_cache_key("list", limit=10, area="TI") == make_cache_key("list", area="TI", limit=10)
+    assert make_cache_key("list", limit=10) != make_cache_key("stats", limit=10)
@@ -0,0 +1,55 @@
+from events import RESET_EVENT, EventBus
+
+def publish(bus: EventBus, count: int) -> list:
+    return [bus.publish("equipment", {"n": n}) for n in range(count)]
+
+def event_id(bus: EventBus, sequence) -> str:
+    return f"{bus.epoch}-{sequence}"
+
+def test_replays_events_after_last_id():
+    bus = EventBus(history_size=10)
+    events = publish(bus, 5)
+    assert bus.missed_since(events[1]["id"]) == events[2:]
+    assert bus.missed_since(event_id(bus, 0)) == events
+
+def test_nothing_missed_at_latest_id():
+    bus = EventBus(history_size=10)
+    events = publish(bus, 3)
+    assert bus.missed_since(events[-1]["id"]) == []
+
+def test_empty_bus_replays_nothing():
+    bus = EventBus(history_size=10)
+    assert bus.missed_since(event_id(bus, 0)) == []
+
+def test_id_beyond_latest_cannot_be_replayed():
+    bus = EventBus(history_size=10)
+    publish(bus, 3)
+    assert bus.missed_since(event_id(bus, 4)) is None
+
+def test_replay_boundaries_after_history_overflow():
+    bus = EventBus(history_size=3)
+    events = publish(bus, 6)
+    # Events 4-6 are kept: an id of 3 still gets all of them, 2 would miss 3
+    assert bus.missed_since(event_id(bus, 3)) == events[3:]
+    assert bus.missed_since(event_id(bus, 4)) == events[4:]
+    assert bus.missed_since(event_id(bus, 2)) is None
+    assert bus.missed_since(event_id(bus, 0)) is None
+
+def test_ids_from_other_processes_cannot_be_replayed():
+    bus = EventBus(history_size=10)
+    publish(bus, 3)
+    assert bus.missed_since(f"{bus.epoch}0-1") is None
+    assert bus.missed_since(f"{bus.epoch}-x") is None
+    assert bus.missed_since(f"{bus.epoch}--1") is None
+    assert bus.missed_since("garbage") is None
+
+def test_subscribe_sends_reset_when_replay_is_impossible():
+    bus = EventBus(history_size=2)
+    events = publish(bus, 4)
+    _, initial = bus.subscribe(event_id(bus, 1))
+    assert [event["type"] for event in initial] == [RESET_EVENT]
+    assert initial[0]["id"] == events[-1]["id"]
+    _, initial = bus.subscribe(events[1]["id"])
+    assert initial == events[2:]
+    _, initial = bus.subscribe(None)
+    assert initial == []
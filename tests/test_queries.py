@@ -0,0 +1,108 @@
+import re
+from datetime import datetime
+
+import pytest
+
+from queries import (
+    EQUALITY_INDEXES,
+    InvalidFilter,
+    QueryPlanner,
+    build_equipment_query,
+    equipment_hint,
+    filter_key,
+    normalize_filter,
+)
+
+def test_normalize_drops_unset_and_blank_fields():
+    assert normalize_filter({"area": "  ", "equipment_type": None, "marca": " HP "}) == {"marca": "HP"}
+
+def test_normalize_defaults_search_mode_to_contains():
+    assert normalize_filter({"search": "abc"}) == {"search": "abc", "search_mode": "contains"}
+    assert normalize_filter({"search": "abc", "search_mode": " "}) == {"search": "abc", "search_mode": "contains"}
+
+def test_normalize_rejects_unknown_search_mode():
+    with pytest.raises(InvalidFilter):
+        normalize_filter({"search": "abc", "search_mode": "fuzzy"})
+
+def test_normalize_drops_search_mode_without_search():
+    assert normalize_filter({"search": " ", "search_mode": "fuzzy"}) == {}
+
+def test_equivalent_filters_share_a_key():
+    first = normalize_filter({"area": "TI", "search": "abc", "estado_equipo": ""})
+    second = normalize_filter({"search": " abc ", "search_mode": "contains", "area": "TI"})
+    assert filter_key(first) == filter_key(second)
+
+def test_contains_search_escapes_regex_characters():
+    query = build_equipment_query(normalize_filter({"search": "a.b*(c"}))
+    patterns = {clause_field: clause[clause_field] for clause in query["$or"] for clause_field in clause}
+    assert set(patterns) == {"marca", "modelo", "serie", "observaciones"}
+    for pattern in patterns.values():
+        assert pattern == {"$regex": re.escape("a.b*(c"), "$options": "i"}
+        assert re.search(pattern["$regex"], "xa.b*(cx")
+        assert not re.search(pattern["$regex"], "aXbbb(c")
+
+def test_prefix_search_is_anchored_escaped_and_lowercased():
+    query = build_equipment_query(normalize_filter({"search": "SN-1.2", "search_mode": "prefix"}))
+    assert query["$or"] == [
+        {"serie_lower": {"$regex": "^" + re.escape("sn-1.2")}},
+        {"nombre_pc_lower": {"$regex": "^" + re.escape("sn-1.2")}},
+    ]
+
+def test_exact_search_matches_lowercased_fields():
+    query = build_equipment_query(normalize_filter({"search": "SN-1", "search_mode": "exact"}))
+    assert query["$or"] == [{"serie_lower": "sn-1"}, {"nombre_pc_lower": "sn-1"}]
+
+def test_area_filter_escapes_regex_characters():
+    query = build_equipment_query(normalize_filter({"area": "I+D (Lab)"}))
+    assert query["area"] == {"$regex": re.escape("I+D (Lab)"), "$options": "i"}
+
+def test_date_range_with_both_ends():
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 31)
+    query = build_equipment_query(normalize_filter({"fecha_inicio": start, "fecha_fin": end}))
+    assert query == {"fecha": {"$gte": start, "$lte": end}}
+
+def test_date_range_open_at_either_end():
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 31)
+    assert build_equipment_query(normalize_filter({"fecha_inicio": start, "fecha_fin": None})) == {"fecha": {"$gte": start}}
+    assert build_equipment_query(normalize_filter({"fecha_inicio": None, "fecha_fin": end})) == {"fecha": {"$lte": end}}
+    assert "fecha" not in build_equipment_query(normalize_filter({"fecha_inicio": None, "fecha_fin": None}))
+
+def test_hint_matches_equality_fields_exactly():
+    assert equipment_hint(normalize_filter({"equipment_type": "Laptop"})) == "type_created_at_id"
+    assert equipment_hint(normalize_filter({"estado_equipo": "Bueno", "area": "TI"})) == "estado_created_at_id"
+    everything = {"equipment_type": "Laptop", "estado_equipo": "Bueno", "tipo_mantenimiento": "preventivo"}
+    assert equipment_hint(normalize_filter(everything)) == "type_estado_mantenimiento_created_at_id"
+    # No compound index covers this pair
+    assert equipment_hint(normalize_filter({"equipment_type": "Laptop", "estado_equipo": "Bueno"})) is None
+    assert equipment_hint(normalize_filter({})) is None
+
+def test_no_hint_for_searches():
+    for mode in ("contains", "text", "exact", "prefix"):
+        assert equipment_hint(normalize_filter({"equipment_type": "Laptop", "search": "abc", "search_mode": mode})) is None
+
+def test_hint_only_names_available_indexes():
+    normalized = normalize_filter({"equipment_type": "Laptop"})
+    assert equipment_hint(normalized, available_indexes={"_id_", "type_created_at_id"}) == "type_created_at_id"
+    assert equipment_hint(normalized, available_indexes={"_id_"}) is None
+
+def test_planner_memoizes_plans_by_normalized_filter():
+    planner = QueryPlanner()
+    first = planner.plan({"equipment_type": "Laptop", "area": ""})
+    second = planner.plan({"equipment_type": " Laptop "})
+    assert first is second
+    assert planner.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+def test_planner_evicts_least_recently_used_plans():
+    planner = QueryPlanner(max_entries=2)
+    planner.plan({"area": "a"})
+    planner.plan({"area": "b"})
+    planner.plan({"area": "a"})
+    planner.plan({"area": "c"})
+    assert [plan.query["area"]["$regex"] for plan in planner.plans.values()] == ["a", "c"]
+
+def test_planner_replans_after_index_discovery():
+    planner = QueryPlanner()
+    assert planner.plan({"equipment_type": "Laptop"}).hint == "type_created_at_id"
+    planner.use_indexes({"_id_", *EQUALITY_INDEXES.values()} - {"type_created_at_id"})
+    assert planner.plan({"equipment_type": "Laptop"}).hint is None
+    assert planner.plan({"estado_equipo": "Bueno"}).hint == "estado_created_at_id"